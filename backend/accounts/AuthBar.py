@@ -1,9 +1,133 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from ninja.security import HttpBearer
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+_jwt = JWTAuthentication()
+
+
+class UserCache:
+    """Users resolved from tokens, by id, for at most ``ttl`` seconds.
+
+    Entries are dropped when the user is saved or deleted in this process; the
+    TTL bounds how long other processes can serve a stale user.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+            return user
+
+    def put(self, user_id, user):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._users[user_id] = (user, time.monotonic() + self.ttl)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+
+user_cache = UserCache(
+    ttl=getattr(settings, "JWT_USER_CACHE_TTL_SECONDS", 60),
+    max_size=getattr(settings, "JWT_USER_CACHE_SIZE", 1024),
+)
+
+
+def invalidate_user(sender, instance, **kwargs):
+    user_cache.invalidate(str(instance.pk))
+
+
+def _token_user_id(validated):
+    try:
+        return validated[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+
+
+def claims_user(validated):
+    """An unsaved ``User`` carrying only the token's user id: enough for
+    ``request.user`` comparisons and foreign keys, without a query."""
+    User = get_user_model()
+    user = User(**{api_settings.USER_ID_FIELD: _token_user_id(validated)}, is_active=True)
+    user._state.adding = False
+    return user
+
+
+def cached_user(validated):
+    # tokens carry non-integer ids as strings
+    user_id = str(_token_user_id(validated))
+    user = user_cache.get(user_id)
+    if user is None:
+        user = _jwt.get_user(validated)
+        user_cache.put(user_id, user)
+    # requests get their own copy so one can't change another's user
+    return copy.copy(user)
+
+
+async def acached_user(validated):
+    user_id = str(_token_user_id(validated))
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await sync_to_async(_jwt.get_user)(validated)
+        user_cache.put(user_id, user)
+    return copy.copy(user)
+
 
 class JWTAuth(HttpBearer):
     def authenticate(self, request, token):
-        validated = JWTAuthentication().get_validated_token(token)
-        user = JWTAuthentication().get_user(validated)
+        try:
+            validated = _jwt.get_validated_token(token)
+            if getattr(settings, "JWT_STATELESS_USERS", False):
+                user = claims_user(validated)
+            else:
+                user = cached_user(validated)
+        except (InvalidToken, AuthenticationFailed):
+            return None
+        request.user = user
+        return token
+
+
+class AsyncJWTAuth(JWTAuth):
+    """``JWTAuth`` for async views: the token is checked on the event loop and
+    only a user cache miss queries the database, in a thread."""
+
+    async def authenticate(self, request, token):
+        try:
+            validated = _jwt.get_validated_token(token)
+            if getattr(settings, "JWT_STATELESS_USERS", False):
+                user = claims_user(validated)
+            else:
+                user = await acached_user(validated)
+        except (InvalidToken, AuthenticationFailed):
+            return None
         request.user = user
         return token
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+        from .AuthBar import invalidate_user
+
+        User = get_user_model()
+        post_save.connect(invalidate_user, sender=User, dispatch_uid="accounts.invalidate_user.save")
+        post_delete.connect(invalidate_user, sender=User, dispatch_uid="accounts.invalidate_user.delete")
@@ -1,3 +1,65 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .AuthBar import UserCache, cached_user, user_cache
+
+
+class UserCacheTests(SimpleTestCase):
+    def test_entries_expire_after_ttl(self):
+        cache = UserCache(ttl=60, max_size=10)
+        with mock.patch("accounts.AuthBar.time.monotonic", return_value=1000.0) as now:
+            cache.put("1", "alice")
+            now.return_value = 1059.0
+            self.assertEqual(cache.get("1"), "alice")
+            now.return_value = 1060.0
+            self.assertIsNone(cache.get("1"))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = UserCache(ttl=60, max_size=2)
+        cache.put("1", "alice")
+        cache.put("2", "bob")
+        cache.get("1")
+        cache.put("3", "carol")
+        self.assertIsNone(cache.get("2"))
+        self.assertEqual(cache.get("1"), "alice")
+        self.assertEqual(cache.get("3"), "carol")
+
+    def test_invalidate(self):
+        cache = UserCache(ttl=60, max_size=10)
+        cache.put("1", "alice")
+        cache.put("2", "bob")
+        cache.invalidate("1")
+        self.assertIsNone(cache.get("1"))
+        self.assertEqual(cache.get("2"), "bob")
+        cache.invalidate()
+        self.assertIsNone(cache.get("2"))
+
+    def test_disabled(self):
+        for cache in (UserCache(ttl=0, max_size=10), UserCache(ttl=60, max_size=0)):
+            cache.put("1", "alice")
+            self.assertIsNone(cache.get("1"))
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        user_cache.invalidate()
+        self.user = User.objects.create_user("alice", password="pw")
+        self.token = AccessToken.for_user(self.user)
+
+    def test_cache_hit_skips_the_database(self):
+        cached_user(self.token)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_user(self.token).pk, self.user.pk)
+
+    def test_saving_the_user_invalidates(self):
+        cached_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(user_cache.get(str(self.user.pk)))
+
+    def test_requests_get_their_own_copy(self):
+        cached_user(self.token).username = "mallory"
+        self.assertEqual(cached_user(self.token).username, "alice")
@@ -0,0 +1,27 @@
+def sqlite_database(name, wal=True, synchronous="NORMAL", busy_timeout=20, immediate=True, conn_max_age=600):
+    """``DATABASES`` entry for an SQLite file shared by web and render workers.
+
+    WAL lets readers run alongside the one writer, ``busy_timeout`` makes a
+    writer wait for the lock instead of failing with "database is locked", and
+    IMMEDIATE transactions take the write lock up front, so a transaction that
+    reads before it writes can't fail on the upgrade. ``synchronous=NORMAL`` is
+    durable across application crashes in WAL mode and only fsyncs at
+    checkpoints. Connections are kept for ``conn_max_age`` seconds.
+    """
+    pragmas = [f"PRAGMA busy_timeout={int(busy_timeout * 1000)}"]
+    if wal:
+        pragmas += ["PRAGMA journal_mode=WAL", f"PRAGMA synchronous={synchronous}"]
+    options = {
+        # sqlite3.connect's own busy handler, used before the pragmas run
+        "timeout": busy_timeout,
+        "init_command": ";".join(pragmas),
+    }
+    if immediate:
+        options["transaction_mode"] = "IMMEDIATE"
+    return {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": name,
+        "OPTIONS": options,
+        "CONN_MAX_AGE": conn_max_age,
+        "CONN_HEALTH_CHECKS": conn_max_age != 0,
+    }
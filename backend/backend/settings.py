@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
+from .database import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -73,6 +75,114 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# Users resolved from access tokens are cached per process for
+# JWT_USER_CACHE_TTL_SECONDS (up to JWT_USER_CACHE_SIZE users) and dropped when
+# saved or deleted here. JWT_STATELESS_USERS skips the database entirely and
+# gives requests an unsaved User with only the token's user id, so deactivated
+# users keep access until their token expires.
+JWT_USER_CACHE_TTL_SECONDS = 60
+JWT_USER_CACHE_SIZE = 1024
+JWT_STATELESS_USERS = False
+
+# Whisper models are loaded once per worker process and shared between jobs.
+# Models listed in WHISPER_PRELOAD_MODELS are loaded in the background at startup;
+# idle models are dropped after WHISPER_IDLE_SECONDS or when the loaded set
+# exceeds WHISPER_MEMORY_BUDGET_MB.
+WHISPER_MODEL = "base"
+WHISPER_DEVICE = None
+WHISPER_PRELOAD_MODELS = []
+WHISPER_MEMORY_BUDGET_MB = 2048
+WHISPER_IDLE_SECONDS = 15 * 60
+
+# Highlight detection samples every MOTION_FRAME_STRIDE-th frame and decimates
+# frames wider than MOTION_ANALYSIS_WIDTH before diffing (None keeps full size).
+MOTION_FRAME_STRIDE = 1
+MOTION_ANALYSIS_WIDTH = None
+
+# Highlights are whole windows of the short's duration scored by normalised
+# motion blended with speech coverage (HIGHLIGHT_SPEECH_WEIGHT is the speech
+# share). When several shorts are cut from one video, their windows may overlap
+# by at most HIGHLIGHT_MAX_OVERLAP of their length; MAX_SHORTS_PER_CONVERT caps
+# how many one convert request can ask for.
+HIGHLIGHT_SPEECH_WEIGHT = 0.5
+HIGHLIGHT_MAX_OVERLAP = 0.0
+MAX_SHORTS_PER_CONVERT = 5
+
+# Disk budget for the rendered filter variants kept per video; the least
+# recently used variants are evicted once it is exceeded.
+FILTER_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Preview renders: a PREVIEW_SECONDS excerpt (or a strip of PREVIEW_FRAMES
+# stills) at PREVIEW_WIDTH x PREVIEW_HEIGHT, cached under media/previews.
+PREVIEW_WIDTH = 360
+PREVIEW_HEIGHT = 640
+PREVIEW_SECONDS = 4
+PREVIEW_FRAMES = 4
+PREVIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Encodes of at least PARALLEL_ENCODE_MIN_SECONDS are split at keyframes into
+# chunks of at least PARALLEL_ENCODE_CHUNK_SECONDS and encoded by up to
+# PARALLEL_ENCODE_WORKERS ffmpeg processes (None uses every core).
+PARALLEL_ENCODE_WORKERS = None
+PARALLEL_ENCODE_MIN_SECONDS = 20
+PARALLEL_ENCODE_CHUNK_SECONDS = 5
+
+# Downloaded sources are shared between jobs, keyed by video id and format, and
+# removed once unused for SOURCE_CACHE_TTL_SECONDS. file:// URLs are only
+# accepted when SOURCE_ALLOW_FILE_URLS is set (offline testing).
+SOURCE_FORMAT = 'best[height<=480][ext=mp4]'
+SOURCE_CACHE_TTL_SECONDS = 60 * 60
+SOURCE_ALLOW_FILE_URLS = False
+
+# Threads shared by highlight analysis (transcription and motion scan run side
+# by side); None sizes the pool to the core count.
+ANALYSIS_WORKERS = None
+
+# /api/metrics serves per-stage histograms in the Prometheus text format; when
+# METRICS_TOKEN is set, scrapers must send it as a bearer token, otherwise only
+# staff users (with a JWT access token) may read them.
+METRICS_TOKEN = None
+
+# x264 profile for every encode: "quality", "balanced" or "throughput" (see
+# core/profiles.py), or "adaptive" to step from balanced to throughput and
+# split the cores between renders as more of them run at once.
+ENCODING_PROFILE = 'adaptive'
+
+# Media is only served through signed URLs bound to the owning user; a URL
+# stays the same for MEDIA_URL_TTL_SECONDS and works for up to twice that.
+# MEDIA_SENDFILE hands the file to the front proxy instead of Django:
+# "x-accel-redirect" (nginx, internal location MEDIA_ACCEL_REDIRECT_PREFIX
+# aliased to MEDIA_ROOT) or "x-sendfile" (Apache, lighttpd).
+MEDIA_URL_TTL_SECONDS = 6 * 60 * 60
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# The media janitor runs after a job at most every JANITOR_INTERVAL_SECONDS
+# (0 disables it; `manage.py clean_media` runs it by hand). It removes temp
+# files, encoder leftovers and files no video points at once they are
+# JANITOR_MIN_AGE_SECONDS old, then evicts cached filter/subtitle variants,
+# previews and decoded audio, least recently used first, while media exceeds
+# MEDIA_DISK_BUDGET_BYTES (None for no budget).
+MEDIA_DISK_BUDGET_BYTES = 5 * 1024 * 1024 * 1024
+JANITOR_INTERVAL_SECONDS = 15 * 60
+JANITOR_MIN_AGE_SECONDS = 60 * 60
+
+# At most FFMPEG_MAX_CONCURRENCY ffmpeg processes run at once in a server
+# process, counting render jobs, encode chunks and previews (None for one per
+# core). Previews and job event streams are async views (serve
+# backend.asgi:application with an ASGI server to benefit) that wait for their
+# ffmpeg slot on the event loop; their blocking work, such as Whisper and
+# ffprobe, runs on a pool of ASYNC_BLOCKING_WORKERS threads.
+FFMPEG_MAX_CONCURRENCY = None
+ASYNC_BLOCKING_WORKERS = 4
+
+# Size of the local worker pool that runs convert, filter and subtitle jobs.
+# Jobs only live in the process that queued them, so with
+# RECOVER_INTERRUPTED_JOBS a process's first request fails the unfinished jobs
+# of processes on the same host that have exited.
+RENDER_WORKERS = 2
+RECOVER_INTERRUPTED_JOBS = True
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -99,11 +209,11 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite is shared by the web process and the render workers: WAL, a busy
+# timeout and IMMEDIATE transactions keep concurrent writes from failing with
+# "database is locked", and connections are reused (see backend/database.py).
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
 }
 
 
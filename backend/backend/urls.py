@@ -1,15 +1,17 @@
 
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from ninja import NinjaAPI
 from accounts.api import auth_router
-from core.api import core_router
+from core.api import core_router, metrics_router
+from core.media import serve_media
 from django.conf import settings
-from django.conf.urls.static import static
 api = NinjaAPI()
 api.add_router("/auth/", auth_router)
 api.add_router('/core/',core_router)
+api.add_router('/', metrics_router)
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", api.urls),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<name>.+)$", serve_media),
+]
@@ -0,0 +1,38 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ASYNC_BLOCKING_WORKERS", 4),
+                thread_name_prefix="blocking",
+            )
+        return _executor
+
+
+def _call(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run ``fn`` (Whisper, OpenCV, ffprobe, file scans) on the bounded
+    blocking pool, so an async view waits for it without holding a thread of
+    its own. Context variables (metrics collection, progress) carry over."""
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _call, fn, args, kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), call)
@@ -1,118 +1,346 @@
+from django.conf import settings
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
 from ninja import Router
-from .models import YouTubeVideo
-from .schema import VideoIn, VideoOut,FilterIn,SubtitleStyle
-from .utils import download_youtube_video, trim_video,resizing_trimmed_video,apply_filter_to_video,add_subtitles_to_video
-from accounts.AuthBar import JWTAuth
+from .models import YouTubeVideo, RenderJob
+from .schema import VideoIn, VideoOut, VideoPageOut, JobOut, FilterIn, FilterBatchIn, SubtitleStyle, FilterPreviewIn, SubtitlePreviewIn, PreviewOut
+from .aio import run_blocking
+from .jobs import enqueue_job
+from .media import signed_media_url, url_epoch
+from .metrics import render_prometheus
+from .progress import board
+from .transcripts import video_segments
+from .variants import master_name, look_name
+from .utils import FILTERS, preview_filter_async, preview_subtitles_async
+from accounts.AuthBar import AsyncJWTAuth, JWTAuth
 from ninja.errors import HttpError
 core_router = Router(auth=JWTAuth())
+metrics_router = Router()
+staff_auth = JWTAuth()
+# views that wait on ffmpeg, Whisper or job progress are async, so an ASGI
+# worker holds them without a thread each; they need the async authenticator
+async_auth = AsyncJWTAuth()
 
-@core_router.post("convert-video", response=VideoOut)
-def convert_video(request, data: VideoIn):
-    video = YouTubeVideo.objects.create(
-        user=request.user, youtube_url=data.youtube_url
-    )
-    input_path, title, yt_id = download_youtube_video(data.youtube_url, video.id)
-    video.title = title
-    relative_short_path = trim_video(input_path, yt_id, video.id)
-    relative_short_path_resized = resizing_trimmed_video(
-    relative_short_path, yt_id, video.id
-)
+# an SSE comment is sent when nothing changed for this long, to keep proxies from closing the stream
+JOB_EVENTS_HEARTBEAT_SECONDS = 15
+
+MY_VIDEOS_PAGE_SIZE = 20
+MY_VIDEOS_MAX_PAGE_SIZE = 100
 
-    video.short_video_file.name = str(relative_short_path_resized)
-    video.save()
 
+def _video_out(request, video):
     return VideoOut(
         id=video.id,
         youtube_url=str(video.youtube_url),
         title=video.title,
-        short_video_file=request.build_absolute_uri(video.short_video_file.url) if video.short_video_file else None,
+        short_video_file=_media_url(request, video.short_video_file.name) if video.short_video_file else None,
+        filter_name=video.filter_name,
         created_at=video.created_at,
         updated_at=video.updated_at,
     )
 
 
-@core_router.get("my-videos", response=list[VideoOut])
-def list_my_videos(request):
-    videos = YouTubeVideo.objects.filter(user=request.user).order_by("-created_at")
+def _ass_style(body: SubtitleStyle):
+    def hex_to_ass_color(hex_color: str) -> str:
+        hex_color = hex_color.lstrip('#')
+        bbggrr = hex_color[4:6]+hex_color[2:4]+hex_color[0:2]  
+        return f'&H00{bbggrr.upper()}'
 
-    return [
-        VideoOut(
-            id=video.id,
-            youtube_url=str(video.youtube_url),
-            title=video.title,
-            short_video_file=request.build_absolute_uri(video.short_video_file.url) if video.short_video_file else None,
-            created_at=video.created_at,
-            updated_at=video.updated_at,
-        )
-        for video in videos
-    ]
+    return {
+        "font": body.font,
+        "fontsize": body.fontsize,
+        "bold": 1 if (body.bold and int(body.bold) >= 700) else 0,
+        "color": hex_to_ass_color(body.color),
+    }
 
 
-@core_router.post("/videos/{video_id}/apply-filter", response=VideoOut)
-def filter_video(request, video_id: int, data: FilterIn):
+def _get_short(request, video_id):
     try:
         video = YouTubeVideo.objects.get(id=video_id, user=request.user)
     except YouTubeVideo.DoesNotExist:
-        raise HttpError("Video not found.")
+        raise HttpError(404, "Video not found.")
 
     if not video.short_video_file:
-        raise HttpError("Cannot apply filter: Original short video does not exist.")
+        raise HttpError(400, "Original short video does not exist.")
+    return video
 
-    new_filtered_path = apply_filter_to_video(
-        input_relative_path=video.short_video_file.name,
-        filter_name=data.filter_name
+
+async def _aget_short(request, video_id):
+    try:
+        video = await YouTubeVideo.objects.aget(id=video_id, user=request.user)
+    except YouTubeVideo.DoesNotExist:
+        raise HttpError(404, "Video not found.")
+
+    if not video.short_video_file:
+        raise HttpError(400, "Original short video does not exist.")
+    return video
+
+
+def _media_url(request, relative_path):
+    return signed_media_url(request, relative_path)
+
+
+def _job_out(request, job):
+    return JobOut(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        stage=job.stage,
+        stages=job.stages,
+        timings=job.timings,
+        result={**job.result, "files": {name: _media_url(request, path) for name, path in job.result.get("files", {}).items()}}
+            if job.result else {},
+        error=job.error,
+        video_id=job.video_id,
+        video=_video_out(request, job.video) if job.status == RenderJob.STATUS_SUCCEEDED else None,
+        videos=[_video_out(request, video) for video in job.outputs.order_by('id')] if job.status == RenderJob.STATUS_SUCCEEDED else [],
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
     )
-    video.short_video_file.name = new_filtered_path
-    video.save()
 
-    return VideoOut(
-        id=video.id,
-        youtube_url=str(video.youtube_url),
-        title=video.title,
-        short_video_file=request.build_absolute_uri(video.short_video_file.url) if video.short_video_file else None,
-        created_at=video.created_at,
-        updated_at=video.updated_at,
+
+@core_router.post("convert-video", response=JobOut)
+def convert_video(request, data: VideoIn):
+    max_count = getattr(settings, "MAX_SHORTS_PER_CONVERT", 5)
+    if not 1 <= data.count <= max_count:
+        raise HttpError(400, f"count must be between 1 and {max_count}.")
+    if not 5 <= data.duration <= 180:
+        raise HttpError(400, "duration must be between 5 and 180 seconds.")
+
+    video = YouTubeVideo.objects.create(
+        user=request.user, youtube_url=data.youtube_url
     )
+    job = enqueue_job(request.user, video, RenderJob.KIND_CONVERT, {"count": data.count, "duration": data.duration})
+    return _job_out(request, job)
 
-@core_router.post('/videos/{video_id}/apply-subtitles',response=VideoOut)
-def subtitles(request,video_id:int , body: SubtitleStyle):
+
+def _get_job(request, job_id):
     try:
-        video = YouTubeVideo.objects.get(id=video_id, user=request.user)
-    except YouTubeVideo.DoesNotExist:
-        raise HttpError("Video not found.")
-    
-    if not video.short_video_file:
-        raise HttpError("Cannot apply filter: Original short video does not exist.")
-    
-    color = body.color  
-    def hex_to_ass_color(hex_color: str) -> str:
-        hex_color = hex_color.lstrip('#')
-        bbggrr = hex_color[4:6]+hex_color[2:4]+hex_color[0:2]  
-        return f'&H00{bbggrr.upper()}'
+        return RenderJob.objects.select_related('video').get(id=job_id, user=request.user)
+    except RenderJob.DoesNotExist:
+        raise HttpError(404, "Job not found.")
+
+
+@core_router.get("jobs/{job_id}", response=JobOut)
+def job_status(request, job_id: int):
+    return _job_out(request, _get_job(request, job_id))
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {data}\n\n"
 
-    ass_color = hex_to_ass_color(body.color)
-    ass_bold = 1 if (body.bold and int(body.bold) >= 700) else 0
-    ass_font = body.font
-    ass_size = body.fontsize
-    input_video_path = video.original_short_video_file.name if hasattr(video, 'original_short_video_file') else video.short_video_file.name
-
-    new_subtitle_video = add_subtitles_to_video(
-        input_relative_path=video.short_video_file.name,
-        font=ass_font,
-        fontsize=ass_size,
-        bold=ass_bold,
-        color=ass_color,
+
+class _JobEvents:
+    """The server-sent events of one job. The sync and async streams only
+    differ in how they wait for the next progress state."""
+
+    def __init__(self, request, job):
+        self.request = request
+        self.job_id = job.id
+        self.version = -1
+        self.last_sent = time.monotonic()
+        self.done = False
+
+    def from_row(self):
+        # not running in this process: queued, finished, or on another worker
+        current = RenderJob.objects.select_related('video').get(id=self.job_id)
+        if current.status in (RenderJob.STATUS_SUCCEEDED, RenderJob.STATUS_FAILED):
+            self.done = True
+            return [_sse("done", _job_out(self.request, current).model_dump_json())]
+        return self.from_state({"version": max(self.version, 0), "stage": current.stage, "stages": {}})
+
+    def from_state(self, state):
+        now = time.monotonic()
+        if state["version"] != self.version:
+            self.version = state["version"]
+            self.last_sent = now
+            return [_sse("progress", json.dumps({
+                "id": self.job_id,
+                "stage": state["stage"],
+                "stages": state["stages"],
+            }))]
+        if now - self.last_sent >= JOB_EVENTS_HEARTBEAT_SECONDS:
+            self.last_sent = now
+            return [": keep-alive\n\n"]
+        return []
+
+
+def _job_events(events):
+    while not events.done:
+        state = board.wait(events.job_id, events.version, timeout=JOB_EVENTS_HEARTBEAT_SECONDS)
+        if state is not None:
+            yield from events.from_state(state)
+            continue
+        yield from events.from_row()
+        if not events.done:
+            time.sleep(1)
+
+
+async def _ajob_events(events):
+    while not events.done:
+        state = await board.wait_async(events.job_id, events.version, timeout=JOB_EVENTS_HEARTBEAT_SECONDS)
+        if state is not None:
+            for chunk in events.from_state(state):
+                yield chunk
+            continue
+        for chunk in await sync_to_async(events.from_row)():
+            yield chunk
+        if not events.done:
+            await asyncio.sleep(1)
+
+
+@core_router.get("jobs/{job_id}/events", auth=async_auth)
+async def job_events(request, job_id: int):
+    job = await sync_to_async(_get_job)(request, job_id)
+    # WSGI servers can only send a response from a sync iterator
+    events = _JobEvents(request, job)
+    stream = _ajob_events(events) if isinstance(request, ASGIRequest) else _job_events(events)
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _encode_cursor(video):
+    raw = f"{video.created_at.isoformat()}|{video.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, _, video_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), int(video_id)
+    except ValueError:
+        raise HttpError(400, "Invalid cursor.")
+
+
+@core_router.get("my-videos", response={200: VideoPageOut, 304: None})
+def list_my_videos(request, response: HttpResponse, cursor: str = None, limit: int = MY_VIDEOS_PAGE_SIZE):
+    limit = min(max(limit, 1), MY_VIDEOS_MAX_PAGE_SIZE)
+    videos = (
+        YouTubeVideo.objects.filter(user=request.user)
+        .only("id", "youtube_url", "title", "short_video_file", "filter_name", "created_at", "updated_at")
+        .order_by("-created_at", "-id")
     )
-    video.short_video_file = new_subtitle_video
-    video.save()
-    
-    return VideoOut(
-        id=video.id,
-        youtube_url=str(video.youtube_url),
-        title=video.title,
-        short_video_file=request.build_absolute_uri(video.short_video_file.url) if video.short_video_file else None,
-        created_at=video.created_at,
-        updated_at=video.updated_at,
+    if cursor:
+        created_at, video_id = _decode_cursor(cursor)
+        videos = videos.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=video_id))
+    page = list(videos[:limit + 1])
+    items, more = page[:limit], len(page) > limit
+
+    # the page changes only when one of its rows, or the row after it, does
+    version = [(video.id, video.updated_at.isoformat()) for video in page]
+    # the signed file URLs in the page change once per epoch
+    etag = '"%s"' % hashlib.sha1(json.dumps([cursor, limit, url_epoch(), version]).encode()).hexdigest()
+    last_modified = max((video.updated_at for video in page), default=None)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified.timestamp())
+
+    if_none_match = request.headers.get("If-None-Match")
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    # If-None-Match wins when both are sent, as only the ETag notices a deleted row
+    if if_none_match is not None:
+        not_modified = etag in (tag.strip() for tag in if_none_match.split(","))
+    else:
+        not_modified = bool(if_modified_since and last_modified and int(last_modified.timestamp()) <= if_modified_since)
+    if not_modified:
+        not_modified_response = HttpResponse(status=304)
+        for name, value in headers.items():
+            not_modified_response[name] = value
+        return not_modified_response
+
+    for name, value in headers.items():
+        response[name] = value
+    return VideoPageOut(
+        items=[_video_out(request, video) for video in items],
+        next_cursor=_encode_cursor(items[-1]) if more else None,
+    )
+
+
+@core_router.post("/videos/{video_id}/apply-filter", response=JobOut)
+def filter_video(request, video_id: int, data: FilterIn):
+    video = _get_short(request, video_id)
+    if data.filter_name not in FILTERS:
+        raise HttpError(400, f"Invalid filter: {data.filter_name}")
+
+    job = enqueue_job(request.user, video, RenderJob.KIND_FILTER, {"filter_name": data.filter_name})
+    return _job_out(request, job)
+
+
+@core_router.post("/videos/{video_id}/apply-filters", response=JobOut)
+def filter_video_batch(request, video_id: int, data: FilterBatchIn):
+    video = _get_short(request, video_id)
+    names = list(dict.fromkeys(data.filter_names))
+    if not names:
+        raise HttpError(400, "No filters given.")
+    invalid = [name for name in names if name not in FILTERS]
+    if invalid:
+        raise HttpError(400, f"Invalid filter: {', '.join(invalid)}")
+
+    job = enqueue_job(request.user, video, RenderJob.KIND_FILTER_BATCH, {"filter_names": names})
+    return _job_out(request, job)
+
+
+@core_router.post("/videos/{video_id}/apply-filter/preview", response=PreviewOut, auth=async_auth)
+async def filter_preview(request, video_id: int, data: FilterPreviewIn):
+    video = await _aget_short(request, video_id)
+    if data.filter_name not in FILTERS:
+        raise HttpError(400, f"Invalid filter: {data.filter_name}")
+    if data.mode not in ("clip", "frames"):
+        raise HttpError(400, f"Invalid preview mode: {data.mode}")
+
+    master = await run_blocking(master_name, video)
+    preview = await preview_filter_async(master, data.filter_name, mode=data.mode, start=data.start)
+    return PreviewOut(video_id=video.id, mode=data.mode, preview_file=_media_url(request, preview))
+
+
+@core_router.post('/videos/{video_id}/apply-subtitles',response=JobOut)
+def subtitles(request,video_id:int , body: SubtitleStyle):
+    video = _get_short(request, video_id)
+    job = enqueue_job(request.user, video, RenderJob.KIND_SUBTITLES, {**_ass_style(body), "soft": body.soft})
+    return _job_out(request, job)
+
+
+@core_router.post('/videos/{video_id}/apply-subtitles/preview', response=PreviewOut, auth=async_auth)
+async def subtitles_preview(request, video_id: int, body: SubtitlePreviewIn):
+    video = await _aget_short(request, video_id)
+    if body.mode not in ("clip", "frames"):
+        raise HttpError(400, f"Invalid preview mode: {body.mode}")
+
+    look = await run_blocking(look_name, video, render=False)
+    # a transcript that isn't cached yet runs Whisper
+    segments = await run_blocking(video_segments, video)
+    preview = await preview_subtitles_async(
+        look,
+        segments,
+        mode=body.mode,
+        start=body.start,
+        **_ass_style(body),
     )
+    return PreviewOut(video_id=video.id, mode=body.mode, preview_file=_media_url(request, preview))
+
 
-    
\ No newline at end of file
+@metrics_router.get("metrics", include_in_schema=False)
+def metrics(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token:
+        authorized = request.headers.get("Authorization") == f"Bearer {token}"
+    else:
+        # without a scrape token the metrics are for staff users only
+        authorized = staff_auth(request) is not None and request.user.is_staff
+    if not authorized:
+        raise HttpError(401, "Unauthorized")
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
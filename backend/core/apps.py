@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+
+
+def _recover_interrupted_jobs(**kwargs):
+    # once per process, on its first request rather than in ready(), which
+    # also runs for migrate and other commands that shouldn't touch jobs
+    request_started.disconnect(dispatch_uid="core.recover_interrupted_jobs")
+    from .jobs import recover_interrupted_jobs
+    recover_interrupted_jobs()
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        if getattr(settings, "WHISPER_PRELOAD_MODELS", None):
+            from .whisper_models import preload_whisper_models
+            preload_whisper_models()
+        if getattr(settings, "RECOVER_INTERRUPTED_JOBS", True):
+            request_started.connect(_recover_interrupted_jobs, dispatch_uid="core.recover_interrupted_jobs")
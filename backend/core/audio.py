@@ -0,0 +1,50 @@
+import os
+import subprocess
+import uuid
+
+import numpy as np
+
+from .encoder import run_ffmpeg
+
+SAMPLE_RATE = 16000
+
+
+def pcm_path_for(media_path: str) -> str:
+    return os.path.splitext(media_path)[0] + ".f32"
+
+
+def extract_pcm(media_path: str) -> str:
+    """Decode the first audio stream once to raw 16 kHz mono float32 next to the media."""
+    pcm_path = pcm_path_for(media_path)
+    if os.path.exists(pcm_path) and os.path.getmtime(pcm_path) >= os.path.getmtime(media_path):
+        return pcm_path
+
+    temp_path = f"{pcm_path}.{uuid.uuid4().hex[:8]}.tmp"
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-nostdin",
+        "-i", media_path,
+        "-map", "0:a:0",
+        "-ac", "1",
+        "-ar", str(SAMPLE_RATE),
+        "-f", "f32le",
+        temp_path
+    ]
+    try:
+        run_ffmpeg(cmd, "audio")
+        os.replace(temp_path, pcm_path)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        print("FFmpeg audio extraction error:\n", e.stderr.decode())
+        raise e
+    return pcm_path
+
+
+def load_pcm(pcm_path: str):
+    if os.path.getsize(pcm_path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    # copy-on-write so torch.from_numpy gets a writable array without
+    # reading the whole file into memory up front
+    return np.memmap(pcm_path, dtype=np.float32, mode="c")
@@ -0,0 +1,402 @@
+import asyncio
+import collections
+import functools
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import metrics, progress
+
+# filters that count frames from the start of their input can't be restarted
+# at every chunk boundary without changing the output
+_FRAME_COUNTING_FILTERS = re.compile(r"\bfade\b")
+
+
+# only the tail of ffmpeg's log is kept, for error messages
+STDERR_TAIL_BYTES = 64 * 1024
+
+
+def _read_tail(stream, tail):
+    for chunk in iter(lambda: stream.read1(4096), b""):
+        tail += chunk
+        del tail[:-STDERR_TAIL_BYTES]
+
+
+class FFmpegSlots:
+    """A counting semaphore shared by threads and event loops.
+
+    Slots go to waiters first come, first served: a thread blocks on an
+    event, while a coroutine awaits a future on its own loop, so waiting in
+    an async view never holds a thread.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._free = limit
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()
+
+    def acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            granted = threading.Event()
+            self._waiters.append(granted.set)
+        granted.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        grant = functools.partial(loop.call_soon_threadsafe, self._grant, future)
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            self._waiters.append(grant)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if grant in self._waiters:
+                    self._waiters.remove(grant)
+                    raise
+            # handed over already: _grant gives back a slot its cancelled
+            # waiter never saw, and one that was seen is released here
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def _grant(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                grant = self._waiters.popleft()
+                try:
+                    grant()
+                    return
+                except RuntimeError:
+                    # the waiter's event loop has closed
+                    continue
+            if self._free >= self.limit:
+                raise ValueError("FFmpeg slot released too many times")
+            self._free += 1
+
+    @property
+    def free(self) -> int:
+        return self._free
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+_ffmpeg_slots = None
+_ffmpeg_slots_lock = threading.Lock()
+
+
+def ffmpeg_slots() -> FFmpegSlots:
+    """The FFMPEG_MAX_CONCURRENCY slots every ffmpeg run in this process,
+    render worker or request, waits for."""
+    global _ffmpeg_slots
+    with _ffmpeg_slots_lock:
+        if _ffmpeg_slots is None:
+            limit = getattr(settings, "FFMPEG_MAX_CONCURRENCY", None) or os.cpu_count() or 1
+            _ffmpeg_slots = FFmpegSlots(limit)
+        return _ffmpeg_slots
+
+
+def run_ffmpeg(cmd, stage: str, tracker=None, part=0, frame_rate: float = None):
+    """Run ffmpeg like ``subprocess.run(cmd, check=True, capture_output=True)``.
+
+    Progress is read from ``-progress pipe:1`` as ffmpeg runs and passed to
+    ``tracker`` in seconds of output, counted in frames when ``frame_rate`` is
+    given; wall time, CPU time, peak RSS and the final fps/speed are recorded
+    as a stage metric.
+    """
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    with ffmpeg_slots():
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        tail = bytearray()
+        reader = threading.Thread(target=_read_tail, args=(proc.stderr, tail), daemon=True)
+        reader.start()
+
+        report = {}
+        with proc.stdout:
+            for line in proc.stdout:
+                _progress_line(report, line, tracker, part, frame_rate)
+        reader.join()
+        proc.stderr.close()
+        stderr = bytes(tail)
+
+        usage = None
+        if hasattr(os, "wait4"):
+            # reap the child ourselves to get its own resource usage
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            proc.wait()
+    metrics.record_ffmpeg(stage, time.perf_counter() - t0, usage, _number(report.get("fps")), _number(report.get("speed")))
+
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output=b"", stderr=stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, b"", stderr)
+
+
+def _progress_line(report, line, tracker, part, frame_rate):
+    key, _, value = line.decode(errors="ignore").strip().partition("=")
+    report[key] = value
+    if key == "progress" and tracker is not None:
+        out_us = report.get("out_time_us") or report.get("out_time_ms")
+        if frame_rate and report.get("frame", "").isdigit():
+            tracker.update(int(report["frame"]) / frame_rate, part)
+        elif not frame_rate and out_us and out_us.isdigit():
+            tracker.update(int(out_us) / 1e6, part)
+
+
+async def _read_tail_async(stream, tail):
+    while chunk := await stream.read(4096):
+        tail += chunk
+        del tail[:-STDERR_TAIL_BYTES]
+
+
+async def run_ffmpeg_async(cmd, stage: str, tracker=None, part=0, frame_rate: float = None):
+    """``run_ffmpeg`` for async views: the slot and ffmpeg are awaited on the
+    event loop, and ffmpeg is killed if the request is cancelled. The event
+    loop reaps the child, so no CPU time or RSS is recorded for it.
+    """
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    slots = ffmpeg_slots()
+    await slots.acquire_async()
+    try:
+        t0 = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        tail = bytearray()
+        reader = asyncio.ensure_future(_read_tail_async(proc.stderr, tail))
+        report = {}
+        try:
+            async for line in proc.stdout:
+                _progress_line(report, line, tracker, part, frame_rate)
+            await reader
+            await proc.wait()
+        except BaseException:
+            reader.cancel()
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+    finally:
+        slots.release()
+    metrics.record_ffmpeg(stage, time.perf_counter() - t0, None, _number(report.get("fps")), _number(report.get("speed")))
+
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output=b"", stderr=bytes(tail))
+    return subprocess.CompletedProcess(cmd, proc.returncode, b"", bytes(tail))
+
+
+def _number(value):
+    try:
+        return float((value or "").rstrip("x"))
+    except ValueError:
+        return None
+
+
+def probe_video(path: str):
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,codec_name,avg_frame_rate:stream_side_data=rotation:format=duration",
+        "-of", "json",
+        path
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        print("FFprobe error:\n", e.stderr.decode())
+        raise e
+
+    info = json.loads(result.stdout)
+    stream = info["streams"][0]
+    width, height = int(stream["width"]), int(stream["height"])
+    rotation = next((int(sd.get("rotation", 0)) for sd in stream.get("side_data_list", [])), 0)
+    if abs(rotation) % 180 == 90:
+        width, height = height, width
+    num, _, den = stream.get("avg_frame_rate", "0/0").partition("/")
+
+    return {
+        "width": width,
+        "height": height,
+        "codec": stream.get("codec_name"),
+        "duration": float(info.get("format", {}).get("duration") or 0),
+        "fps": float(num) / float(den) if num and den and float(den) else None,
+    }
+
+
+def keyframe_times(path: str, start: float = 0, end: float = None):
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+    ]
+    if start or end is not None:
+        cmd += ["-read_intervals", f"{start}%{end if end is not None else ''}"]
+    cmd.append(path)
+
+    result = subprocess.run(cmd, check=True, capture_output=True)
+    times = []
+    for line in result.stdout.decode().splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.append(float(pts))
+    return sorted(times)
+
+
+def plan_chunks(start: float, duration: float, keyframes, chunks: int, min_chunk: float):
+    end = start + duration
+    candidates = [t for t in keyframes if start + min_chunk <= t <= end - min_chunk]
+    cuts = []
+    for i in range(1, chunks):
+        if not candidates:
+            break
+        target = start + duration * i / chunks
+        cut = min(candidates, key=lambda t: abs(t - target))
+        if not cuts or cut - cuts[-1] >= min_chunk:
+            cuts.append(cut)
+    bounds = [start, *cuts, end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def is_chunk_safe(graph: str) -> bool:
+    return not _FRAME_COUNTING_FILTERS.search(graph or "")
+
+
+def _span(input_path, start, duration):
+    return duration if duration is not None else max(probe_video(input_path)["duration"] - start, 0)
+
+
+def _encode_single(input_path, output_path, filter_args, video_args, audio_args, start, duration, stage, threads=None):
+    cmd = ["ffmpeg", "-y"]
+    if start:
+        cmd += ["-ss", str(start)]
+    cmd += ["-i", input_path]
+    if duration is not None:
+        cmd += ["-t", str(duration)]
+    cmd += [*filter_args, *video_args]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd += [*audio_args, output_path]
+    run_ffmpeg(cmd, stage, tracker=progress.track(stage, lambda: _span(input_path, start, duration)))
+
+
+def _encode_chunk(input_path, chunk_path, filter_args, video_args, origin, start, end, threads, stage, tracker, part,
+    frame_rate):
+    # input-side -ss/-t with -copyts, shifted back by the render origin, gives
+    # time-based filters such as ass the same clock as a single-process encode
+    cmd = [
+        "ffmpeg", "-y",
+        "-itsoffset", f"{-origin:.6f}",
+        "-ss", f"{start - origin:.6f}",
+        "-t", f"{end - start:.6f}",
+        "-copyts",
+        "-i", input_path,
+        *filter_args,
+        "-an",
+        *video_args,
+        "-threads", str(threads),
+        chunk_path
+    ]
+    # with -copyts ffmpeg's out_time doesn't follow the chunk, so count frames
+    run_ffmpeg(cmd, f"{stage}.chunk", tracker=tracker, part=part, frame_rate=frame_rate)
+
+
+def encode_video(input_path: str, output_path: str, filter_args, video_args, audio_args,
+    start: float = 0, duration: float = None, graph: str = None, workers: int = None, stage: str = "encode",
+    threads: int = None):
+    """Encode ``input_path`` with one ffmpeg process, or split it into keyframe
+    aligned chunks encoded in parallel and joined with a stream-copy concat.
+
+    ``threads`` caps the encoder threads of the whole encode, chunks included.
+    """
+    workers = workers or getattr(settings, "PARALLEL_ENCODE_WORKERS", None) or os.cpu_count() or 1
+    if threads:
+        workers = min(workers, threads)
+    min_seconds = getattr(settings, "PARALLEL_ENCODE_MIN_SECONDS", 20)
+    min_chunk = getattr(settings, "PARALLEL_ENCODE_CHUNK_SECONDS", 5)
+
+    if workers < 2 or not is_chunk_safe(graph):
+        return _encode_single(input_path, output_path, filter_args, video_args, audio_args, start, duration, stage, threads)
+
+    span = _span(input_path, start, duration)
+    chunks = min(workers, int(span // min_chunk))
+    if chunks < 2 or span < min_seconds:
+        return _encode_single(input_path, output_path, filter_args, video_args, audio_args, start, duration, stage, threads)
+
+    keyframes = keyframe_times(input_path, start, start + span)
+    bounds = plan_chunks(start, span, keyframes, chunks, min_chunk)
+    if len(bounds) < 2:
+        return _encode_single(input_path, output_path, filter_args, video_args, audio_args, start, duration, stage, threads)
+
+    threads = max((threads or os.cpu_count() or 1) // len(bounds), 1)
+    tracker = progress.track(stage, span)
+    frame_rate = probe_video(input_path)["fps"]
+    if frame_rate:
+        # ffprobe rounds keyframe times, so each cut sits half a frame before
+        # its keyframe and that frame can only land in the chunk it starts; the
+        # last chunk runs a frame long and the concat keeps as many frames as
+        # a single-process encode of ``duration`` writes
+        half_frame = 0.5 / frame_rate
+        cuts = [start] + [cs - half_frame for cs, _ in bounds[1:]] + [start + span + 2 * half_frame]
+        bounds = list(zip(cuts[:-1], cuts[1:]))
+    frame_limit = ["-frames:v", str(math.ceil(span * frame_rate - 1e-3))] if frame_rate and duration is not None else []
+    work_dir = tempfile.mkdtemp(prefix="chunks_", dir=os.path.dirname(output_path))
+    try:
+        chunk_paths = [os.path.join(work_dir, f"chunk_{i:03d}.mp4") for i in range(len(bounds))]
+        with ThreadPoolExecutor(max_workers=len(bounds)) as pool:
+            futures = [
+                metrics.submit(pool, _encode_chunk, input_path, path, filter_args, video_args, start, cs, ce, threads,
+                    stage, tracker, i, frame_rate)
+                for i, (path, (cs, ce)) in enumerate(zip(chunk_paths, bounds))
+            ]
+            for future in futures:
+                future.result()
+
+        list_path = os.path.join(work_dir, "chunks.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in chunk_paths:
+                f.write(f"file '{path}'\n")
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-ss", str(start), "-t", str(span), "-i", input_path,
+            "-map", "0:v:0", "-map", "1:a:0?",
+            "-c:v", "copy", *frame_limit,
+            *audio_args,
+            output_path
+        ]
+        run_ffmpeg(cmd, f"{stage}.concat")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
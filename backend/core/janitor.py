@@ -0,0 +1,140 @@
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from .media_cache import cache_stats, referenced_names
+from .sources import source_store
+from .variants import DERIVED_SUFFIX
+from .whisper_models import whisper_models
+
+# files an encode or PCM extraction writes before renaming them into place, and
+# subtitle files that only exist while a burn or mux runs
+_INTERMEDIATE = re.compile(r"_temp_[0-9a-f]{8}\.|\.(?:srt|ass|tmp)$")
+# work directories of the chunked encoder and the smart trim
+_WORK_DIR = re.compile(r"^(?:chunks|trim)_")
+
+_lock = threading.Lock()
+_last_run = None
+
+
+def _owner_stem(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return DERIVED_SUFFIX.sub("", stem.split("_preview_", 1)[0])
+
+
+def _classify(rel, owned):
+    parts = rel.split("/")
+    if parts[0] == "temp" or any(_WORK_DIR.match(part) for part in parts[:-1]) or _INTERMEDIATE.search(parts[-1]):
+        return "intermediate"
+    owner = _owner_stem(rel)
+    if owner not in owned:
+        return "orphan"
+    if parts[-1] == f"{owner}.mp4":
+        # an unreferenced master is still what older shorts restyle from
+        return "keep"
+    # variants, previews and sidecars such as the decoded PCM can be rebuilt
+    return "cache"
+
+
+def _remove(path, report, kind, size, dry_run):
+    if not dry_run:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+    report[kind]["files"] += 1
+    report[kind]["bytes"] += size
+
+
+def run_janitor(budget_bytes: int = None, min_age_seconds: float = None, dry_run: bool = False) -> dict:
+    """Reconcile MEDIA_ROOT against the files ``YouTubeVideo`` rows point at.
+
+    Intermediates and orphans older than ``min_age_seconds`` are removed; if
+    the media still exceeds ``budget_bytes``, cached variants, previews and
+    sidecars such as decoded PCM go least recently used first. Referenced
+    files and their masters are never touched, and downloaded sources are left
+    to the source store.
+    """
+
+    root = str(settings.MEDIA_ROOT)
+    budget_bytes = budget_bytes if budget_bytes is not None else getattr(settings, "MEDIA_DISK_BUDGET_BYTES", None)
+    min_age_seconds = min_age_seconds if min_age_seconds is not None else getattr(settings, "JANITOR_MIN_AGE_SECONDS", 60 * 60)
+    report = {kind: {"files": 0, "bytes": 0} for kind in ("intermediate", "orphan", "cache")}
+
+    with _lock:
+        if not dry_run:
+            report["sources_removed"] = source_store.sweep()
+
+        referenced = referenced_names()
+        owned = {_owner_stem(name) for name in referenced}
+
+        cutoff = time.time() - min_age_seconds
+        total = 0
+        candidates = []
+        work_dirs = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = os.path.relpath(dirpath, root).replace("\\", "/")
+            if rel_dir == "sources" or rel_dir.startswith("sources/"):
+                dirnames[:] = []
+                total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+                continue
+            if _WORK_DIR.match(os.path.basename(dirpath)):
+                work_dirs.append(dirpath)
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(path, root).replace("\\", "/")
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                kind = "keep" if rel in referenced else _classify(rel, owned)
+                if kind in ("intermediate", "orphan") and st.st_mtime < cutoff:
+                    _remove(path, report, kind, st.st_size, dry_run)
+                    continue
+                total += st.st_size
+                if kind == "cache" and st.st_mtime < cutoff:
+                    candidates.append((st.st_mtime, st.st_size, path))
+
+        # mtime is the last access for cached variants (see media_cache.cache_hit)
+        for _, size, path in sorted(candidates):
+            if budget_bytes is None or total <= budget_bytes:
+                break
+            _remove(path, report, "cache", size, dry_run)
+            total -= size
+
+        if not dry_run:
+            for path in sorted(work_dirs, reverse=True):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    pass
+
+    reclaimed = sum(report[kind]["bytes"] for kind in ("intermediate", "orphan", "cache"))
+    if not dry_run:
+        cache_stats.record(
+            "janitor",
+            evictions=sum(report[kind]["files"] for kind in ("intermediate", "orphan", "cache")),
+            evicted_bytes=reclaimed,
+        )
+    report["reclaimed_bytes"] = reclaimed
+    report["total_bytes"] = total
+    return report
+
+
+def run_janitor_if_due():
+    """Run the janitor when JANITOR_INTERVAL_SECONDS have passed since the last
+    run in this process; returns the report, or ``None`` when not due.
+
+    Whisper models idle past WHISPER_IDLE_SECONDS are dropped on every call,
+    since nothing else releases them while no transcription runs.
+    """
+    global _last_run
+    whisper_models.evict_idle()
+    interval = getattr(settings, "JANITOR_INTERVAL_SECONDS", 15 * 60)
+    if not interval or _lock.locked() or (_last_run is not None and time.monotonic() - _last_run < interval):
+        return None
+    _last_run = time.monotonic()
+    return run_janitor()
@@ -0,0 +1,246 @@
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .janitor import run_janitor_if_due
+from .metrics import collect, for_video, measure, unattribute
+from .models import RenderJob, StageMetric, YouTubeVideo
+from .profiles import rendering
+from .progress import bind, set_stage
+from .sources import source_store
+from .transcripts import video_segments
+from .variants import master_name, look_name
+from .utils import (
+    analyze_highlight, render_short,
+    apply_filter_to_video, apply_filters_to_video, add_subtitles_to_video,
+)
+
+JOB_STAGES = {
+    RenderJob.KIND_CONVERT: ['download', 'analyze', 'render'],
+    RenderJob.KIND_FILTER: ['filter'],
+    RenderJob.KIND_SUBTITLES: ['subtitles'],
+    RenderJob.KIND_FILTER_BATCH: ['filter'],
+}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_started_at = timezone.now()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "RENDER_WORKERS", 2),
+                thread_name_prefix="render",
+            )
+        return _executor
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_job(user, video, kind, params=None):
+    job = RenderJob.objects.create(
+        user=user,
+        video=video,
+        kind=kind,
+        params=params or {},
+        stages={name: 'pending' for name in JOB_STAGES[kind]},
+        worker=_worker_id(),
+    )
+    transaction.on_commit(lambda: _get_executor().submit(run_job, job.id))
+    return job
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def recover_interrupted_jobs():
+    """Fail the queued and running jobs of processes on this host that have
+    exited; they lived in that process's worker pool and nothing will pick
+    them up again. Jobs of other hosts and of live processes are left alone.
+    """
+    host = socket.gethostname()
+    unfinished = RenderJob.objects.filter(status__in=[RenderJob.STATUS_QUEUED, RenderJob.STATUS_RUNNING])
+    lost = []
+    for job_id, worker, created_at in unfinished.values_list("id", "worker", "created_at"):
+        job_host, _, pid = worker.rpartition(":")
+        if not worker:
+            # queued before jobs recorded their worker
+            if created_at < _started_at:
+                lost.append(job_id)
+        elif job_host == host and pid.isdigit() and int(pid) != os.getpid() and not _process_alive(int(pid)):
+            lost.append(job_id)
+    now = timezone.now()
+    return unfinished.filter(id__in=lost).update(
+        status=RenderJob.STATUS_FAILED, error="Interrupted by a server restart.", finished_at=now, updated_at=now,
+    )
+
+
+@contextmanager
+def _stage(job, name):
+    job.stage = name
+    job.stages[name] = 'running'
+    job.save(update_fields=['stage', 'stages', 'updated_at'])
+    set_stage(name)
+    try:
+        with measure(name):
+            yield
+    except Exception:
+        job.stages[name] = 'failed'
+        raise
+    job.stages[name] = 'done'
+    job.save(update_fields=['stages', 'updated_at'])
+
+
+def _run_convert(job):
+    video = job.video
+    duration = job.params.get('duration', 30)
+
+    with _stage(job, 'download'):
+        source = source_store.acquire(video.youtube_url)
+    try:
+        _convert_source(job, video, source, duration)
+    finally:
+        source_store.release(source)
+
+
+def _convert_source(job, video, source, duration):
+    input_path, yt_id = source.path, source.yt_id
+    video.title = source.title
+    video.save(update_fields=['title', 'updated_at'])
+
+    with _stage(job, 'analyze'):
+        analysis = analyze_highlight(input_path, duration=duration, count=job.params.get('count', 1))
+        job.timings.update({f"analyze.{phase}": t for phase, t in analysis["timings"].items()})
+        job.save(update_fields=['timings', 'updated_at'])
+
+    # one short per highlight window, all cut from the same download and analysis;
+    # the extra shorts only get a row once their render is about to start, and
+    # lose it again if it fails, so my-videos never lists an empty one
+    with _stage(job, 'render'):
+        for i, window in enumerate(analysis["windows"]):
+            short = video if i == 0 else YouTubeVideo.objects.create(
+                user=job.user, youtube_url=video.youtube_url, title=source.title,
+            )
+            try:
+                with for_video(short.id):
+                    relative_short_path = render_short(input_path, yt_id, short.id, start_time=window["start"], duration=duration)
+            except Exception:
+                if short is not video:
+                    unattribute(short.id)
+                    short.delete()
+                raise
+            # the clean render is kept as the master every later look is made from
+            short.short_video_file.name = str(relative_short_path)
+            short.original_short_video_file.name = str(relative_short_path)
+            short.filter_name = ''
+            short.subtitles = None
+            short.transcript = analysis["transcript"]
+            short.clip_start = window["start"]
+            short.clip_duration = duration
+            short.save(update_fields=['short_video_file', 'original_short_video_file', 'filter_name', 'subtitles',
+                'transcript', 'clip_start', 'clip_duration', 'updated_at'])
+            job.outputs.add(short)
+
+
+def _run_filter(job):
+    video = job.video
+    with _stage(job, 'filter'):
+        video.short_video_file.name = apply_filter_to_video(
+            input_relative_path=master_name(video),
+            filter_name=job.params['filter_name'],
+        )
+        video.filter_name = job.params['filter_name']
+        if video.subtitles:
+            # filters render from the master, so the subtitles go back on top
+            video.short_video_file.name = _add_subtitles(video, video.short_video_file.name, video.subtitles)
+        video.save(update_fields=['short_video_file', 'filter_name', 'updated_at'])
+
+
+def _run_filter_batch(job):
+    video = job.video
+    with _stage(job, 'filter'):
+        # the look the video shows now may be one of the cached variants
+        batch = apply_filters_to_video(master_name(video), job.params['filter_names'],
+            keep=(video.short_video_file.name, video.original_short_video_file.name))
+        job.result = {"files": batch["files"]}
+        job.timings.update(batch["timings"])
+        job.save(update_fields=['result', 'timings', 'updated_at'])
+
+
+def _add_subtitles(video, input_relative_path, style):
+    return add_subtitles_to_video(
+        input_relative_path=input_relative_path,
+        segments=video_segments(video),
+        language=video.transcript.language if video.transcript_id else None,
+        **style,
+    )
+
+
+def _run_subtitles(job):
+    video = job.video
+    with _stage(job, 'subtitles'):
+        # always from the unsubtitled look, so restyles replace rather than stack
+        video.short_video_file.name = _add_subtitles(video, look_name(video), job.params)
+        video.subtitles = job.params
+        video.save(update_fields=['short_video_file', 'subtitles', 'updated_at'])
+
+
+JOB_HANDLERS = {
+    RenderJob.KIND_CONVERT: _run_convert,
+    RenderJob.KIND_FILTER: _run_filter,
+    RenderJob.KIND_SUBTITLES: _run_subtitles,
+    RenderJob.KIND_FILTER_BATCH: _run_filter_batch,
+}
+
+
+def run_job(job_id):
+    close_old_connections()
+    try:
+        job = RenderJob.objects.select_related('video').get(id=job_id)
+        job.status = RenderJob.STATUS_RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+
+        with bind(job.id), rendering():
+            with collect() as samples:
+                try:
+                    JOB_HANDLERS[job.kind](job)
+                except Exception as e:
+                    logger.exception("%s job %s failed", job.kind, job.id)
+                    job.status = RenderJob.STATUS_FAILED
+                    job.error = str(e)
+                else:
+                    job.status = RenderJob.STATUS_SUCCEEDED
+            # one short write transaction, so pollers see the metrics and the
+            # final status together
+            with transaction.atomic():
+                StageMetric.objects.bulk_create(
+                    StageMetric(job=job, **{"video_id": job.video_id, **sample}) for sample in samples
+                )
+                job.finished_at = timezone.now()
+                job.save(update_fields=['status', 'stages', 'error', 'finished_at', 'updated_at'])
+        run_janitor_if_due()
+    finally:
+        # keeps the worker's connection for reuse unless it is broken or past CONN_MAX_AGE
+        close_old_connections()
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import YouTubeVideo
+
+MODES = ["wsgi", "asgi"]
+
+# light requests are sent this often while the previews render
+PROBE_INTERVAL_SECONDS = 0.1
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class _ThreadPeak:
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.05):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = ("Send concurrent preview renders, plus a steady trickle of light requests, through the WSGI handler on "
+        "a fixed pool of worker threads and through the ASGI handler on one event loop, and report throughput, "
+        "latency and threads used. Requests are served in process, so only the concurrency models differ.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES + ["both"], default="both")
+        parser.add_argument("--video", type=int, help="Video to preview (default: the latest one with a short)")
+        parser.add_argument("--previews", type=int, default=8, help="Preview renders in flight at once")
+        parser.add_argument("--threads", type=int, default=4, help="Worker threads of the WSGI server")
+        parser.add_argument("--filter", default="grayscale")
+
+    def handle(self, *args, **options):
+        videos = YouTubeVideo.objects.exclude(short_video_file="").select_related("user").order_by("-id")
+        video = videos.filter(id=options["video"]).first() if options["video"] else videos.first()
+        if video is None:
+            raise CommandError("No video with a rendered short to preview.")
+
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(video.user)}"}
+        self.preview_url = f"/api/core/videos/{video.id}/apply-filter/preview"
+        self.light_url = "/api/core/my-videos?limit=1"
+        self.filter_name = options["filter"]
+        self.created = set()
+
+        self.stdout.write(f"{options['previews']} previews of video {video.id}, WSGI on {options['threads']} threads, "
+            f"FFMPEG_MAX_CONCURRENCY={getattr(settings, 'FFMPEG_MAX_CONCURRENCY', None)}")
+        self.stdout.write(f"{'mode':<6}{'previews/s':>12}{'preview p95':>13}{'light reqs':>12}{'light p50':>11}"
+            f"{'light p95':>11}{'peak threads':>14}")
+        modes = MODES if options["mode"] == "both" else [options["mode"]]
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                for offset, mode in enumerate(modes):
+                    # a different start per run and request, so nothing comes from the preview cache
+                    starts = [round(0.5 + i * 0.1 + offset * 0.05 + time.time() % 1 / 100, 3)
+                        for i in range(options["previews"])]
+                    run = self._wsgi if mode == "wsgi" else self._asgi
+                    with _ThreadPeak() as threads:
+                        stats = run(starts, options["threads"])
+                    self._report(mode, stats, threads.peak)
+        finally:
+            for name in self.created:
+                path = os.path.join(settings.MEDIA_ROOT, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _preview_body(self, start):
+        return {"filter_name": self.filter_name, "mode": "clip", "start": start}
+
+    def _check(self, response):
+        if response.status_code != 200:
+            raise CommandError(f"{response.status_code}: {response.content[:200]!r}")
+        if "preview_file" in (data := response.json()):
+            path = unquote(urlsplit(data["preview_file"]).path)
+            self.created.add(path[len(settings.MEDIA_URL):])
+
+    def _wsgi(self, starts, threads):
+        stats = {"preview_ms": [], "light_ms": []}
+        client = Client()
+        done = threading.Event()
+
+        def preview(start, sent):
+            # timed from submission, so waiting for a free thread counts
+            self._check(client.post(self.preview_url, self._preview_body(start), content_type="application/json",
+                headers=self.headers))
+            stats["preview_ms"].append((time.perf_counter() - sent) * 1000)
+
+        def light():
+            self._check(client.get(self.light_url, headers=self.headers))
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            t0 = time.perf_counter()
+            futures = [pool.submit(preview, start, t0) for start in starts]
+
+            def probe():
+                # light requests queue for the same worker threads as the renders
+                while not done.is_set():
+                    sent = time.perf_counter()
+                    pool.submit(light).result()
+                    stats["light_ms"].append((time.perf_counter() - sent) * 1000)
+                    done.wait(PROBE_INTERVAL_SECONDS)
+
+            prober = threading.Thread(target=probe)
+            prober.start()
+            for future in futures:
+                future.result()
+            stats["elapsed"] = time.perf_counter() - t0
+            done.set()
+            prober.join()
+        return stats
+
+    def _asgi(self, starts, threads):
+        stats = {"preview_ms": [], "light_ms": []}
+        client = AsyncClient()
+
+        async def preview(start):
+            t0 = time.perf_counter()
+            self._check(await client.post(self.preview_url, self._preview_body(start),
+                content_type="application/json", headers=self.headers))
+            stats["preview_ms"].append((time.perf_counter() - t0) * 1000)
+
+        async def probe(done):
+            while not done.is_set():
+                sent = time.perf_counter()
+                self._check(await client.get(self.light_url, headers=self.headers))
+                stats["light_ms"].append((time.perf_counter() - sent) * 1000)
+                try:
+                    await asyncio.wait_for(done.wait(), PROBE_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+        async def main():
+            done = asyncio.Event()
+            prober = asyncio.ensure_future(probe(done))
+            t0 = time.perf_counter()
+            await asyncio.gather(*(preview(start) for start in starts))
+            stats["elapsed"] = time.perf_counter() - t0
+            done.set()
+            await prober
+
+        asyncio.run(main())
+        return stats
+
+    def _report(self, mode, stats, peak_threads):
+        self.stdout.write(
+            f"{mode:<6}{len(stats['preview_ms']) / stats['elapsed']:12.2f}"
+            f"{_percentile(stats['preview_ms'], 0.95):11.0f}ms{len(stats['light_ms']):12d}"
+            f"{_percentile(stats['light_ms'], 0.5):9.0f}ms{_percentile(stats['light_ms'], 0.95):9.0f}ms"
+            f"{peak_threads:14d}"
+        )
@@ -0,0 +1,57 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.AuthBar import JWTAuth, user_cache
+
+
+def legacy_authenticate(request, token):
+    # the authenticator before the user cache: two authenticators and a query per request
+    validated = JWTAuthentication().get_validated_token(token)
+    request.user = JWTAuthentication().get_user(validated)
+    return token
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead of bearer token authentication on the core router."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--users", type=int, default=10, help="Distinct users the requests are spread over")
+
+    def _run(self, label, authenticate, requests, tokens):
+        factory = RequestFactory()
+        with CaptureQueriesContext(connection) as queries:
+            t0 = time.perf_counter()
+            for i in range(requests):
+                token = tokens[i % len(tokens)]
+                request = factory.get("/api/core/my-videos", HTTP_AUTHORIZATION=f"Bearer {token}")
+                assert authenticate(request, token) == token
+            elapsed = time.perf_counter() - t0
+        self.stdout.write(
+            f"{label:<24}{elapsed / requests * 1e6:9.1f} us/request{len(queries) / requests:8.2f} queries/request"
+        )
+
+    def handle(self, *args, **options):
+        requests = max(options["requests"], 1)
+        auth = JWTAuth()
+
+        # users are created in a transaction that is rolled back afterwards
+        with transaction.atomic():
+            users = [User.objects.create_user(username=f"bench_auth_{i}") for i in range(max(options["users"], 1))]
+            tokens = [str(AccessToken.for_user(user)) for user in users]
+
+            self._run("legacy", legacy_authenticate, requests, tokens)
+            user_cache.invalidate()
+            self._run("cached", auth.authenticate, requests, tokens)
+            with override_settings(JWT_STATELESS_USERS=True):
+                self._run("stateless", auth.authenticate, requests, tokens)
+
+            transaction.set_rollback(True)
+        user_cache.invalidate()
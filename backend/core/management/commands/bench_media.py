@@ -0,0 +1,187 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.audio import extract_pcm, load_pcm
+from core.whisper_models import whisper_models
+from core.utils import (
+    FILTERS, find_best_start, trim_video, resizing_trimmed_video, render_short,
+    apply_filter_to_video, apply_filters_to_video, add_subtitles_to_video,
+)
+
+FIXTURES = {
+    "landscape_15s": (1280, 720, 15),
+    "landscape_45s": (1280, 720, 45),
+    "portrait_15s": (720, 1280, 15),
+    "portrait_45s": (720, 1280, 45),
+}
+QUICK_FIXTURES = ["landscape_15s", "portrait_15s"]
+
+# speech-like audio: pink noise gated into 1.6 s "phrases" every 2.5 s
+SPEECH_PERIOD = 2.5
+SPEECH_ON = 1.6
+
+
+def make_fixture(path, width, height, seconds):
+    cmd = [
+        "ffmpeg", "-y", "-nostdin",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30:duration={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.3:seed=42:duration={seconds}",
+        "-af", f"volume='if(lt(mod(t,{SPEECH_PERIOD}),{SPEECH_ON}),1,0)':eval=frame",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", "60", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "96k",
+        "-shortest",
+        path
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def speech_segments(seconds):
+    segments = []
+    t = 0.0
+    while t < seconds:
+        segments.append({"start": t, "end": min(t + SPEECH_ON, seconds), "text": f" phrase {len(segments) + 1}"})
+        t += SPEECH_PERIOD
+    return segments
+
+
+class Command(BaseCommand):
+    help = "Time every media stage on deterministic synthetic fixtures and check against a stored baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Write results JSON here")
+        parser.add_argument("--baseline", help="Baseline JSON to check results against")
+        parser.add_argument("--save-baseline", help="Write these results as the new baseline")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+            help="Allowed slowdown over baseline before a stage counts as a regression (0.25 = 25%%)")
+        parser.add_argument("--fixtures-dir", help="Reuse generated fixtures from this directory")
+        parser.add_argument("--quick", action="store_true", help="Short fixtures and a few filters only")
+        parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is kept")
+        parser.add_argument("--with-whisper", action="store_true",
+            help="Include Whisper transcription (needs model weights cached locally)")
+
+    def _time(self, results, name, fn, repeat, setup=None):
+        best = None
+        for _ in range(repeat):
+            args = (setup(),) if setup else ()
+            t0 = time.perf_counter()
+            fn(*args)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = round(best, 3)
+        self.stdout.write(f"  {name:<44}{best:8.2f}s")
+
+    def handle(self, *args, **options):
+        repeat = max(options["repeat"], 1)
+        names = QUICK_FIXTURES if options["quick"] else list(FIXTURES)
+        filters = ["grayscale", "sepia", "lightning"] if options["quick"] else list(FILTERS)
+
+        fixtures_dir = options["fixtures_dir"] or tempfile.mkdtemp(prefix="bench_fixtures_")
+        os.makedirs(fixtures_dir, exist_ok=True)
+        results = {}
+
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root, WHISPER_DEVICE="cpu",
+            ):
+                for name in names:
+                    width, height, seconds = FIXTURES[name]
+                    fixture = os.path.join(fixtures_dir, f"{name}.mp4")
+                    if not os.path.exists(fixture):
+                        make_fixture(fixture, width, height, seconds)
+                    self.stdout.write(f"{name} ({width}x{height}, {seconds}s)")
+
+                    segments = speech_segments(seconds)
+                    if options["with_whisper"]:
+                        pcm = load_pcm(extract_pcm(fixture))
+                        self._time(results, f"{name}/transcribe",
+                            lambda: whisper_models.transcribe(pcm, verbose=False), repeat)
+                    self._time(results, f"{name}/find_best_start",
+                        lambda: find_best_start(fixture, segments=segments), repeat)
+
+                    duration = min(10, seconds)
+                    source = os.path.join(media_root, "source.mp4")
+
+                    def copy_source():
+                        shutil.copyfile(fixture, source)
+
+                    def trim():
+                        copy_source()
+                        return trim_video(source, name, 1, duration=duration, start_time=0)
+
+                    self._time(results, f"{name}/trim_video",
+                        lambda _: trim_video(source, name, 1, duration=duration, start_time=0), repeat, setup=copy_source)
+                    self._time(results, f"{name}/resizing_trimmed_video",
+                        lambda trimmed: resizing_trimmed_video(trimmed, name, 1), repeat, setup=trim)
+                    self._time(results, f"{name}/render_short",
+                        lambda: render_short(fixture, name, 2, start_time=0, duration=duration), repeat)
+
+                    if seconds > 15:
+                        continue
+                    short = os.path.join("shorts", f"short_{name}_2.mp4")
+                    for filter_name in filters:
+                        def run_filter():
+                            out = apply_filter_to_video(short, filter_name)
+                            os.remove(os.path.join(media_root, out))
+                        self._time(results, f"{name}/filter/{filter_name}", run_filter, repeat)
+
+                    def run_batch():
+                        for out in apply_filters_to_video(short, filters)["files"].values():
+                            os.remove(os.path.join(media_root, out))
+                    self._time(results, f"{name}/filter_batch", run_batch, repeat)
+                    sequential = sum(results[f"{name}/filter/{filter_name}"] for filter_name in filters)
+                    self.stdout.write(f"  {'(one job per filter: ' + format(sequential, '.2f') + 's)':<44}"
+                        f"{sequential - results[f'{name}/filter_batch']:+8.2f}s saved")
+
+                    self._time(results, f"{name}/subtitles",
+                        lambda: add_subtitles_to_video(short, segments=segments), repeat)
+        finally:
+            if not options["fixtures_dir"]:
+                shutil.rmtree(fixtures_dir, ignore_errors=True)
+
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "repeat": repeat,
+                "quick": options["quick"],
+                "with_whisper": options["with_whisper"],
+            },
+            "results": results,
+        }
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+        if options["baseline"]:
+            self._check_baseline(options["baseline"], results, options["tolerance"])
+
+    def _check_baseline(self, path, results, tolerance):
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+        regressions = []
+        for name, elapsed in sorted(results.items()):
+            before = baseline.get(name)
+            if before is None:
+                continue
+            ratio = elapsed / before if before else 1.0
+            flag = "REGRESSION" if ratio > 1 + tolerance else ""
+            self.stdout.write(f"{name:<46}{before:8.2f}s -> {elapsed:8.2f}s  x{ratio:5.2f} {flag}")
+            if flag:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} stage(s) regressed beyond {tolerance:.0%}: {', '.join(regressions)}")
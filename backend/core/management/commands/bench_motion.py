@@ -0,0 +1,87 @@
+import json
+import time
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.motion import frame_diffs, motion_per_second, speech_mask, best_speech_second
+
+
+def legacy_best_start(filepath, speech_times, fps=30):
+    cap = cv2.VideoCapture(filepath)
+    fps = cap.get(cv2.CAP_PROP_FPS) or fps
+    frames_diff = []
+
+    ret, prev = cap.read()
+    if not ret:
+        cap.release()
+        return 0
+
+    prev_gray = cv2.cvtColor(prev, cv2.COLOR_BGR2GRAY)
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        diff = cv2.absdiff(prev_gray, gray)
+        frames_diff.append(np.sum(diff))
+        prev_gray = gray
+    cap.release()
+
+    motion_per_sec = []
+    frames_per_second = int(fps)
+    for i in range(0, len(frames_diff), frames_per_second):
+        motion_per_sec.append(np.mean(frames_diff[i:i + frames_per_second]))
+
+    best_score = -1
+    best_time = 0
+    for sec, motion in enumerate(motion_per_sec):
+        if any(start <= sec <= end for start, end in speech_times):
+            if motion > best_score:
+                best_score = motion
+                best_time = sec
+    return max(best_time - 4, 0)
+
+
+def engine_best_start(filepath, segments, stride, analysis_width):
+    diffs, frame_index, fps = frame_diffs(filepath, stride=stride, analysis_width=analysis_width)
+    if not len(diffs):
+        return 0
+    motion = motion_per_second(diffs, frame_index, fps)
+    return max(best_speech_second(motion, speech_mask(segments, len(motion))) - 4, 0)
+
+
+class Command(BaseCommand):
+    help = "Compare the legacy find_best_start motion scan against core.motion on a reference clip."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--segments", help="JSON file with Whisper-style segments; defaults to the whole clip being speech")
+        parser.add_argument("--stride", type=int, action="append", help="Frame stride to test (repeatable)")
+        parser.add_argument("--width", type=int, action="append", help="Analysis width to test, 0 for full resolution (repeatable)")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if options["segments"]:
+            with open(options["segments"], encoding="utf-8") as f:
+                segments = json.load(f)
+        else:
+            segments = [{"start": 0, "end": 10 ** 9}]
+        speech_times = [(int(seg["start"]), int(seg["end"])) for seg in segments]
+
+        t0 = time.perf_counter()
+        legacy_start = legacy_best_start(path, speech_times)
+        legacy_time = time.perf_counter() - t0
+        self.stdout.write(f"legacy                  start={legacy_start:>5}s  {legacy_time:8.3f}s")
+
+        for stride in options["stride"] or [1, 2]:
+            for width in options["width"] or [0, 320]:
+                t0 = time.perf_counter()
+                start = engine_best_start(path, segments, stride, width or None)
+                elapsed = time.perf_counter() - t0
+                label = f"stride={stride} width={width or 'full'}"
+                match = "same" if start == legacy_start else "DIFFERENT"
+                self.stdout.write(
+                    f"{label:<24}start={start:>5}s  {elapsed:8.3f}s  x{legacy_time / elapsed:5.2f}  {match}"
+                )
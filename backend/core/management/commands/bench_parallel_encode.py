@@ -0,0 +1,51 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.encoder import encode_video, probe_video
+from core.utils import FILTERS, _filter_args, reframe_filter
+
+
+class Command(BaseCommand):
+    help = "Benchmark the segmented encoder against single-process encodes for increasing worker counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--graph", default="reframe",
+            help="'reframe' for the 9:16 render graph, or a FILTERS name")
+        parser.add_argument("--workers", type=int, action="append",
+            help="Worker counts to test (repeatable); defaults to 1, 2, 4 ... cpu_count")
+        parser.add_argument("--preset", default="fast")
+
+    def handle(self, *args, **options):
+        if options["graph"] == "reframe":
+            info = probe_video(options["path"])
+            graph = reframe_filter(info["width"], info["height"])
+        elif options["graph"] in FILTERS:
+            graph = FILTERS[options["graph"]]
+        else:
+            raise CommandError(f"Unknown graph: {options['graph']}")
+
+        cpus = os.cpu_count() or 1
+        workers = options["workers"] or sorted({1, *[2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus], cpus})
+        video_args = ["-c:v", "libx264", "-preset", options["preset"], "-crf", "23"]
+
+        baseline = None
+        with tempfile.TemporaryDirectory() as out_dir, override_settings(PARALLEL_ENCODE_MIN_SECONDS=0):
+            for n in workers:
+                out_path = os.path.join(out_dir, f"out_{n}.mp4")
+                t0 = time.perf_counter()
+                encode_video(
+                    options["path"], out_path,
+                    filter_args=_filter_args(graph),
+                    video_args=video_args,
+                    audio_args=["-c:a", "copy"],
+                    graph=graph,
+                    workers=n,
+                )
+                elapsed = time.perf_counter() - t0
+                baseline = baseline or elapsed
+                self.stdout.write(f"workers={n:<3} {elapsed:8.2f}s  speedup x{baseline / elapsed:5.2f}  (cpus={cpus})")
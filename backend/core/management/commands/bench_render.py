@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.utils import trim_video, resizing_trimmed_video, render_short
+
+
+class Command(BaseCommand):
+    help = "Time the two-pass trim + resize render against the single-pass render_short on a source clip."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--start", type=float, default=0)
+        parser.add_argument("--duration", type=int, default=30)
+        parser.add_argument("--runs", type=int, default=1)
+
+    def handle(self, *args, **options):
+        start, duration = options["start"], options["duration"]
+        two_pass, single_pass = [], []
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            for _ in range(options["runs"]):
+                source = os.path.join(media_root, "source" + os.path.splitext(options["path"])[1])
+
+                shutil.copyfile(options["path"], source)
+                t0 = time.perf_counter()
+                trimmed = trim_video(source, "bench", 1, duration=duration, start_time=start)
+                resizing_trimmed_video(trimmed, "bench", 1)
+                two_pass.append(time.perf_counter() - t0)
+
+                shutil.copyfile(options["path"], source)
+                t0 = time.perf_counter()
+                render_short(source, "bench", 2, start_time=start, duration=duration)
+                single_pass.append(time.perf_counter() - t0)
+
+        two, one = min(two_pass), min(single_pass)
+        self.stdout.write(f"two-pass (trim + resize): {two:8.2f}s")
+        self.stdout.write(f"single-pass render:       {one:8.2f}s")
+        self.stdout.write(f"saving per short:         {two - one:8.2f}s ({(two - one) / two:.0%})")
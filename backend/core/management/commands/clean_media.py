@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core.janitor import run_janitor
+
+
+def _mb(n):
+    return n / (1024 * 1024)
+
+
+class Command(BaseCommand):
+    help = "Remove temp, orphaned and intermediate media files and evict cached variants over the disk budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget-mb", type=float, help="Disk budget for MEDIA_ROOT (default MEDIA_DISK_BUDGET_BYTES)")
+        parser.add_argument("--min-age", type=float, help="Only touch files older than this many seconds "
+            "(default JANITOR_MIN_AGE_SECONDS)")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without removing it")
+
+    def handle(self, *args, **options):
+        budget = int(options["budget_mb"] * 1024 * 1024) if options["budget_mb"] is not None else None
+        report = run_janitor(budget_bytes=budget, min_age_seconds=options["min_age"], dry_run=options["dry_run"])
+
+        verb = "would remove" if options["dry_run"] else "removed"
+        for kind in ("intermediate", "orphan", "cache"):
+            self.stdout.write(f"{kind:<14}{verb} {report[kind]['files']:5d} files {_mb(report[kind]['bytes']):10.1f} MB")
+        if "sources_removed" in report:
+            self.stdout.write(f"{'sources':<14}{verb} {report['sources_removed']:5d} files")
+        self.stdout.write(f"reclaimed {_mb(report['reclaimed_bytes']):.1f} MB, media now {_mb(report['total_bytes']):.1f} MB")
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from backend.database import sqlite_database
+from core.models import RenderJob, StageMetric, YouTubeVideo
+
+MODES = ["legacy", "tuned"]
+
+
+def _config(mode, path):
+    if mode == "legacy":
+        # the settings before the storage tuning
+        return {"ENGINE": "django.db.backends.sqlite3", "NAME": path}
+    return sqlite_database(path)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = ("Run concurrent dashboard reads and render-pipeline writes against a scratch SQLite database, "
+        "with the old and the tuned storage settings, and report throughput and lock errors.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES + ["both"], default="both")
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--readers", type=int, default=8, help="Threads listing videos, like dashboard polls")
+        parser.add_argument("--writers", type=int, default=4, help="Threads updating jobs, like render workers")
+        parser.add_argument("--rows", type=int, default=500, help="Videos seeded before the run")
+
+    def handle(self, *args, **options):
+        modes = MODES if options["mode"] == "both" else [options["mode"]]
+        self.stdout.write(f"{'mode':<8}{'reads/s':>10}{'writes/s':>10}{'locked':>8}{'lock rate':>11}"
+            f"{'read p95':>11}{'write p95':>11}")
+        for mode in modes:
+            with tempfile.TemporaryDirectory() as tmp:
+                self._run(mode, os.path.join(tmp, "loadtest.sqlite3"), options)
+
+    def _run(self, mode, path, options):
+        alias = f"loadtest_{mode}"
+        connections.settings[alias] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+            alias: _config(mode, path),
+        })[alias]
+        try:
+            call_command("migrate", database=alias, verbosity=0)
+            user, jobs = self._seed(alias, options["rows"], max(options["writers"], 1))
+            connections[alias].close()
+
+            stats = {"reads": 0, "writes": 0, "locked": 0, "read_ms": [], "write_ms": []}
+            lock = threading.Lock()
+            deadline = time.monotonic() + options["seconds"]
+
+            def request(kind, fn):
+                t0 = time.perf_counter()
+                try:
+                    fn()
+                except OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    with lock:
+                        stats["locked"] += 1
+                    return
+                finally:
+                    # what Django does when a request finishes
+                    connections[alias].close_if_unusable_or_obsolete()
+                with lock:
+                    stats[f"{kind}s"] += 1
+                    stats[f"{kind}_ms"].append((time.perf_counter() - t0) * 1000)
+
+            def read():
+                list(
+                    YouTubeVideo.objects.using(alias).filter(user_id=user.id)
+                    .only("id", "youtube_url", "title", "short_video_file", "filter_name", "created_at", "updated_at")
+                    .order_by("-created_at", "-id")[:20]
+                )
+                User.objects.using(alias).get(pk=user.id)
+
+            def write(job_id, step):
+                # a stage transition followed by its metrics, as the render workers write them
+                with transaction.atomic(using=alias):
+                    job = RenderJob.objects.using(alias).get(id=job_id)
+                    job.stages[f"step{step % 3}"] = "done"
+                    job.save(using=alias, update_fields=["stages", "updated_at"])
+                    StageMetric.objects.using(alias).bulk_create(
+                        StageMetric(video_id=job.video_id, job_id=job_id, stage="loadtest", wall_seconds=0.1,
+                            cpu_seconds=0.1)
+                        for _ in range(3)
+                    )
+
+            def reader():
+                try:
+                    while time.monotonic() < deadline:
+                        request("read", read)
+                finally:
+                    connections[alias].close()
+
+            def writer(job_id):
+                try:
+                    step = 0
+                    while time.monotonic() < deadline:
+                        request("write", lambda: write(job_id, step))
+                        step += 1
+                finally:
+                    connections[alias].close()
+
+            threads = [threading.Thread(target=reader) for _ in range(options["readers"])]
+            threads += [threading.Thread(target=writer, args=(job_id,)) for job_id in jobs]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+
+            attempts = stats["writes"] + stats["reads"] + stats["locked"]
+            self.stdout.write(
+                f"{mode:<8}{stats['reads'] / elapsed:10.1f}{stats['writes'] / elapsed:10.1f}{stats['locked']:8d}"
+                f"{stats['locked'] / max(attempts, 1):11.2%}"
+                f"{_percentile(stats['read_ms'], 0.95):9.1f}ms{_percentile(stats['write_ms'], 0.95):9.1f}ms"
+            )
+        finally:
+            connections[alias].close()
+            del connections.settings[alias]
+
+    def _seed(self, alias, rows, writers):
+        with transaction.atomic(using=alias):
+            user = User.objects.db_manager(alias).create_user(username="loadtest")
+            videos = YouTubeVideo.objects.using(alias).bulk_create(
+                YouTubeVideo(user=user, youtube_url=f"https://youtu.be/loadtest{i}", title=f"Video {i}")
+                for i in range(rows)
+            )
+            jobs = [
+                RenderJob.objects.using(alias).create(user=user, video=videos[i % len(videos)], kind=RenderJob.KIND_FILTER)
+                for i in range(writers)
+            ]
+        return user, [job.id for job in jobs]
@@ -0,0 +1,152 @@
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+_signer = signing.Signer(salt="core.media")
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def url_epoch() -> int:
+    """Signed media URLs only change once per epoch, so the pages that embed
+    them stay cacheable."""
+    return int(time.time()) // getattr(settings, "MEDIA_URL_TTL_SECONDS", 6 * 60 * 60)
+
+
+def _payload(user_id, expires, name):
+    return f"{user_id}:{expires}:{name}"
+
+
+def signed_media_url(request, name: str) -> str:
+    """Absolute URL of the media file ``name`` that only works for the
+    requesting user, for between one and two TTLs."""
+    ttl = getattr(settings, "MEDIA_URL_TTL_SECONDS", 6 * 60 * 60)
+    expires = (url_epoch() + 2) * ttl
+    signature = _signer.sign(_payload(request.user.id, expires, name)).rsplit(_signer.sep, 1)[1]
+    query = urlencode({"u": request.user.id, "e": expires, "s": signature})
+    return request.build_absolute_uri(f"{settings.MEDIA_URL}{quote(name)}?{query}")
+
+
+def _verify(request, name):
+    user_id, expires, signature = (request.GET.get(key, "") for key in ("u", "e", "s"))
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    try:
+        _signer.unsign(f"{_payload(user_id, expires, name)}{_signer.sep}{signature}")
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag in (tag.strip() for tag in if_none_match.split(","))
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return bool(if_modified_since and int(mtime) <= if_modified_since)
+
+
+def _byte_range(request, etag, mtime, size):
+    """The single ``(start, end)`` range to send, ``None`` for the whole file,
+    or ``False`` when the range can't be satisfied."""
+    header = request.headers.get("Range")
+    if not header:
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(mtime):
+        return None
+    match = _RANGE.match(header.strip())
+    if not match:
+        # several ranges, or another unit: the whole file is a valid answer
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last or int(last) == 0:
+            return False
+        start, end = max(size - int(last), 0), size - 1
+    elif last and int(last) < int(first):
+        # an invalid range is ignored rather than refused (RFC 9110 14.1.1)
+        return None
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+def _read_span(f, remaining):
+    with f:
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, name):
+    name = posixpath.normpath(name).lstrip("/")
+    if name.startswith("..") or not _verify(request, name):
+        return HttpResponseForbidden()
+
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    sendfile = getattr(settings, "MEDIA_SENDFILE", None)
+    if sendfile == "x-accel-redirect":
+        # nginx serves the bytes, ranges and validators from an internal location
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/") + quote(name)
+        return response
+    if sendfile == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = os.path.abspath(path)
+        return response
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=3600",
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponse(status=304)
+    else:
+        byte_range = _byte_range(request, etag, stat.st_mtime, stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+        elif byte_range is None:
+            response = FileResponse(open(path, "rb"), content_type=content_type)
+        else:
+            start, end = byte_range
+            f = open(path, "rb")
+            f.seek(start)
+            if end == stat.st_size - 1:
+                # open-ended ranges, which players send, keep the real file so
+                # the server can still use sendfile from the current offset
+                response = FileResponse(f, content_type=content_type, status=206)
+            else:
+                response = StreamingHttpResponse(_read_span(f, end - start + 1), content_type=content_type, status=206)
+                response["Content-Length"] = str(end - start + 1)
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {"hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0})
+
+    def record(self, cache, **deltas):
+        with self._lock:
+            counters = self._counters[cache]
+            for key, value in deltas.items():
+                counters[key] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {cache: dict(counters) for cache, counters in self._counters.items()}
+
+
+cache_stats = CacheStats()
+
+
+def cache_hit(cache: str, path: str) -> bool:
+    if not os.path.exists(path):
+        cache_stats.record(cache, misses=1)
+        return False
+    # mtime doubles as the last-access time for LRU eviction
+    os.utime(path)
+    cache_stats.record(cache, hits=1)
+    return True
+
+
+def referenced_names():
+    """Media names some ``YouTubeVideo`` row points at."""
+    from .models import YouTubeVideo
+
+    names = set()
+    for row in YouTubeVideo.objects.values_list("short_video_file", "original_short_video_file"):
+        names.update(name for name in row if name)
+    return names
+
+
+def evict_lru(cache: str, paths, max_bytes: int, keep=()):
+    """Remove the least recently used of ``paths`` until they fit in
+    ``max_bytes``, sparing ``keep`` and any file a video row points at."""
+    entries = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    if total <= max_bytes:
+        return evicted
+    # another video, or a request being served, may still show a cached file
+    keep = {os.path.normpath(path) for path in keep}
+    keep.update(os.path.normpath(os.path.join(settings.MEDIA_ROOT, name)) for name in referenced_names())
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.normpath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted += size
+        cache_stats.record(cache, evictions=1, evicted_bytes=size)
+    return evicted
@@ -0,0 +1,161 @@
+import contextvars
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+from django.db.models import Count, Q, Sum
+
+from .media_cache import cache_stats
+
+_samples = contextvars.ContextVar("stage_samples", default=None)
+_video = contextvars.ContextVar("stage_video", default=None)
+
+HISTOGRAMS = [
+    ("wall_seconds", "shorts_stage_wall_seconds", "Wall time per pipeline stage.",
+        (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)),
+    ("cpu_seconds", "shorts_stage_cpu_seconds", "CPU time per pipeline stage, of its thread or its ffmpeg process.",
+        (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)),
+    ("peak_rss_bytes", "shorts_stage_peak_rss_bytes", "Peak resident memory of the ffmpeg process per stage.",
+        tuple(mb * 1024 * 1024 for mb in (64, 128, 256, 512, 1024, 2048, 4096, 8192))),
+    ("fps", "shorts_ffmpeg_fps", "Frames per second reported by ffmpeg.",
+        (5, 10, 25, 50, 100, 200, 400, 800)),
+    ("speed", "shorts_ffmpeg_speed_ratio", "Encode speed relative to real time reported by ffmpeg.",
+        (0.25, 0.5, 1, 2, 4, 8, 16, 32)),
+]
+
+
+def maxrss_bytes(maxrss: int) -> int:
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+@contextmanager
+def collect():
+    """Gather the samples recorded by this context and anything it submits
+    through :func:`submit`."""
+    samples = []
+    token = _samples.set(samples)
+    try:
+        yield samples
+    finally:
+        _samples.reset(token)
+
+
+@contextmanager
+def for_video(video_id):
+    """Attribute the samples recorded in this context to ``video_id`` instead
+    of the job's own video (the second and later shorts of a convert)."""
+    token = _video.set(video_id)
+    try:
+        yield
+    finally:
+        _video.reset(token)
+
+
+def unattribute(video_id):
+    """Hand the samples recorded for ``video_id`` back to the job's video,
+    before that video's row is deleted."""
+    for sample in _samples.get() or []:
+        if sample.get("video_id") == video_id:
+            del sample["video_id"]
+
+
+def submit(pool, fn, *args, **kwargs):
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def record(stage, wall_seconds, cpu_seconds, peak_rss_bytes=None, fps=None, speed=None):
+    samples = _samples.get()
+    if samples is None:
+        return
+    sample = {
+        "stage": stage,
+        "wall_seconds": round(wall_seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "peak_rss_bytes": peak_rss_bytes,
+        "fps": fps,
+        "speed": speed,
+    }
+    if _video.get() is not None:
+        sample["video_id"] = _video.get()
+    samples.append(sample)
+
+
+def _thread_cpu_seconds():
+    if hasattr(resource, "RUSAGE_THREAD"):
+        usage = resource.getrusage(resource.RUSAGE_THREAD)
+        return usage.ru_utime + usage.ru_stime
+    return time.thread_time()
+
+
+@contextmanager
+def measure(stage):
+    # CPU is the calling thread's own, so jobs running side by side don't count
+    # each other's work; stages that fan out to a pool measure each piece where
+    # it runs. No peak RSS is recorded: the process high-water mark says
+    # nothing about one stage (ffmpeg children report their own).
+    t0, c0 = time.perf_counter(), _thread_cpu_seconds()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - t0, _thread_cpu_seconds() - c0)
+
+
+def record_ffmpeg(stage, wall_seconds, usage, fps=None, speed=None):
+    record(
+        f"ffmpeg.{stage}",
+        wall_seconds,
+        usage.ru_utime + usage.ru_stime if usage else 0.0,
+        maxrss_bytes(usage.ru_maxrss) if usage else None,
+        fps=fps,
+        speed=speed,
+    )
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def _fmt(value):
+    return repr(float(value)) if value is not None else "0"
+
+
+def render_prometheus() -> str:
+    from .models import RenderJob, StageMetric
+
+    aggregates = {}
+    for field, _, _, buckets in HISTOGRAMS:
+        aggregates[f"{field}__count"] = Count(field)
+        aggregates[f"{field}__sum"] = Sum(field)
+        for i, bound in enumerate(buckets):
+            aggregates[f"{field}__le{i}"] = Count("id", filter=Q(**{f"{field}__lte": bound}))
+    rows = StageMetric.objects.values("stage").annotate(**aggregates).order_by("stage")
+
+    lines = []
+    for field, name, help_text, buckets in HISTOGRAMS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for row in rows:
+            if not row[f"{field}__count"]:
+                continue
+            stage = row["stage"]
+            for i, bound in enumerate(buckets):
+                lines.append(f'{name}_bucket{{{_labels(stage=stage, le=_fmt(bound))}}} {row[f"{field}__le{i}"]}')
+            lines.append(f'{name}_bucket{{{_labels(stage=stage, le="+Inf")}}} {row[f"{field}__count"]}')
+            lines.append(f'{name}_sum{{{_labels(stage=stage)}}} {_fmt(row[f"{field}__sum"])}')
+            lines.append(f'{name}_count{{{_labels(stage=stage)}}} {row[f"{field}__count"]}')
+
+    lines += ["# HELP shorts_render_jobs Render jobs by kind and status.", "# TYPE shorts_render_jobs gauge"]
+    for row in RenderJob.objects.values("kind", "status").annotate(n=Count("id")).order_by("kind", "status"):
+        lines.append(f'shorts_render_jobs{{{_labels(kind=row["kind"], status=row["status"])}}} {row["n"]}')
+
+    snapshot = cache_stats.snapshot()
+    for counter in ("hits", "misses", "evictions", "evicted_bytes"):
+        name = f"shorts_cache_{counter}_total"
+        lines += [f"# HELP {name} Media cache {counter.replace('_', ' ')} since process start.", f"# TYPE {name} counter"]
+        for cache, counters in sorted(snapshot.items()):
+            lines.append(f'{name}{{{_labels(cache=cache)}}} {counters[counter]}')
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_youtubevideo_original_short_video_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='youtubevideo',
+            name='clip_duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='youtubevideo',
+            name='clip_start',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Transcript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('model_name', models.CharField(max_length=32)),
+                ('language', models.CharField(blank=True, max_length=16, null=True)),
+                ('segments', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'model_name'), name='unique_transcript_per_model')],
+            },
+        ),
+        migrations.AddField(
+            model_name='youtubevideo',
+            name='transcript',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='videos', to='core.transcript'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_render_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='renderjob',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_render_job_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=64)),
+                ('wall_seconds', models.FloatField()),
+                ('cpu_seconds', models.FloatField()),
+                ('peak_rss_bytes', models.BigIntegerField(blank=True, null=True)),
+                ('fps', models.FloatField(blank=True, null=True)),
+                ('speed', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stage_metrics', to='core.renderjob')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_metrics', to='core.youtubevideo')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_stage_metric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='renderjob',
+            name='outputs',
+            field=models.ManyToManyField(blank=True, related_name='output_of', to='core.youtubevideo'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_render_job_outputs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='renderjob',
+            name='result',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='renderjob',
+            name='kind',
+            field=models.CharField(choices=[('convert', 'Convert'), ('filter', 'Filter'), ('subtitles', 'Subtitles'), ('filter_batch', 'Filter batch')], max_length=16),
+        ),
+    ]
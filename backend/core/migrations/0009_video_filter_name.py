@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_render_job_result'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='youtubevideo',
+            name='filter_name',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_video_filter_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='youtubevideo',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='video_user_created_idx'),
+        ),
+    ]
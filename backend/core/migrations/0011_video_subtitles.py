@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_video_user_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='youtubevideo',
+            name='subtitles',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_video_subtitles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='renderjob',
+            name='worker',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -2,14 +2,102 @@ from django.db import models
 from django.contrib.auth.models import User
 
 
+class Transcript(models.Model):
+    content_hash = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=32)
+    language = models.CharField(max_length=16, blank=True, null=True)
+    segments = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_hash', 'model_name'], name='unique_transcript_per_model'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name}:{self.content_hash[:12]}"
+
+
 class YouTubeVideo(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='youtube_videos')
     youtube_url = models.URLField(max_length=255)
     title = models.CharField(max_length=255, blank=True, null=True)
     short_video_file = models.FileField(upload_to='shorts/', blank=True, null=True)
     original_short_video_file = models.FileField(upload_to='shorts/originals/', null=True, blank=True)  
+    transcript = models.ForeignKey(Transcript, on_delete=models.SET_NULL, related_name='videos', null=True, blank=True)
+    clip_start = models.FloatField(null=True, blank=True)
+    clip_duration = models.FloatField(null=True, blank=True)
+    filter_name = models.CharField(max_length=64, blank=True, default='')
+    # style and soft flag of the current subtitles, re-applied after a filter
+    subtitles = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # my-videos pages through a user's shorts newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='video_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title or self.youtube_url}"
+
+
+class RenderJob(models.Model):
+    KIND_CONVERT = 'convert'
+    KIND_FILTER = 'filter'
+    KIND_SUBTITLES = 'subtitles'
+    KIND_FILTER_BATCH = 'filter_batch'
+    KIND_CHOICES = [
+        (KIND_CONVERT, 'Convert'),
+        (KIND_FILTER, 'Filter'),
+        (KIND_SUBTITLES, 'Subtitles'),
+        (KIND_FILTER_BATCH, 'Filter batch'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='render_jobs')
+    video = models.ForeignKey(YouTubeVideo, on_delete=models.CASCADE, related_name='jobs')
+    outputs = models.ManyToManyField(YouTubeVideo, related_name='output_of', blank=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    stage = models.CharField(max_length=32, blank=True, default='')
+    stages = models.JSONField(default=dict, blank=True)
+    timings = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, null=True)
+    # host:pid of the process whose worker pool runs the job
+    worker = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} job {self.pk} ({self.status})"
+
+
+class StageMetric(models.Model):
+    video = models.ForeignKey(YouTubeVideo, on_delete=models.CASCADE, related_name='stage_metrics')
+    job = models.ForeignKey(RenderJob, on_delete=models.SET_NULL, related_name='stage_metrics', null=True, blank=True)
+    stage = models.CharField(max_length=64)
+    wall_seconds = models.FloatField()
+    cpu_seconds = models.FloatField()
+    peak_rss_bytes = models.BigIntegerField(null=True, blank=True)
+    fps = models.FloatField(null=True, blank=True)
+    speed = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.stage} {self.wall_seconds:.2f}s (video {self.video_id})"
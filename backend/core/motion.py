@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+
+def frame_diffs(filepath: str, stride: int = 1, analysis_width: int = None, fps: float = 30, on_progress=None):
+    """Sum of absolute grayscale differences between sampled frames.
+
+    Returns ``(diffs, frame_index, fps)`` where ``diffs[i]`` is the motion
+    measured between the frames at ``frame_index[i]`` and ``frame_index[i] + stride``.
+    ``on_progress`` is called about once per second of video with the fraction scanned.
+    """
+    stride = max(int(stride), 1)
+    cap = cv2.VideoCapture(filepath)
+    fps = cap.get(cv2.CAP_PROP_FPS) or fps
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    capacity = max(frame_count // stride, 1)
+    report_every = max(int(fps) // stride, 1)
+    diffs = np.empty(capacity, dtype=np.float64)
+    frame_index = np.empty(capacity, dtype=np.int64)
+
+    def _gray(frame):
+        if analysis_width and frame.shape[1] > analysis_width:
+            step = -(-frame.shape[1] // analysis_width)
+            frame = np.ascontiguousarray(frame[::step, ::step])
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    ret, prev = cap.read()
+    if not ret:
+        cap.release()
+        return diffs[:0], frame_index[:0], fps
+
+    prev_gray = _gray(prev)
+    prev_pos = 0
+    pos = 0
+    n = 0
+    while True:
+        for _ in range(stride - 1):
+            if not cap.grab():
+                break
+            pos += 1
+        ret, frame = cap.read()
+        if not ret:
+            break
+        pos += 1
+
+        gray = _gray(frame)
+        if n == capacity:
+            capacity *= 2
+            diffs = np.resize(diffs, capacity)
+            frame_index = np.resize(frame_index, capacity)
+        diffs[n] = cv2.norm(prev_gray, gray, cv2.NORM_L1)
+        frame_index[n] = prev_pos
+        n += 1
+        if on_progress is not None and frame_count and n % report_every == 0:
+            on_progress(min(pos / frame_count, 1.0))
+        prev_gray = gray
+        prev_pos = pos
+
+    cap.release()
+    return diffs[:n], frame_index[:n], fps
+
+
+def motion_per_second(diffs, frame_index, fps):
+    if not len(diffs):
+        return np.zeros(0, dtype=np.float64)
+    second = frame_index // max(int(fps), 1)
+    sums = np.bincount(second, weights=diffs)
+    counts = np.bincount(second, minlength=len(sums))
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def speech_mask(segments, n_seconds: int):
+    delta = np.zeros(n_seconds + 1, dtype=np.int32)
+    if segments:
+        starts = np.array([int(seg['start']) for seg in segments])
+        ends = np.maximum(np.array([int(seg['end']) for seg in segments]) + 1, starts)
+        np.add.at(delta, np.clip(starts, 0, n_seconds), 1)
+        np.add.at(delta, np.clip(ends, 0, n_seconds), -1)
+    return np.cumsum(delta[:-1]) > 0
+
+
+def best_speech_second(motion, mask):
+    if not mask.any():
+        return 0
+    return int(np.argmax(np.where(mask, motion, -np.inf)))
+
+
+def speech_coverage(segments, n_seconds: int, resolution: int = 10):
+    """Fraction of each second covered by at least one segment."""
+    ticks = n_seconds * resolution
+    delta = np.zeros(ticks + 1, dtype=np.int32)
+    if segments:
+        starts = np.array([seg['start'] for seg in segments], dtype=np.float64)
+        ends = np.array([seg['end'] for seg in segments], dtype=np.float64)
+        np.add.at(delta, np.clip(np.floor(starts * resolution).astype(np.int64), 0, ticks), 1)
+        np.add.at(delta, np.clip(np.ceil(ends * resolution).astype(np.int64), 0, ticks), -1)
+    covered = np.cumsum(delta[:-1]) > 0
+    return covered.reshape(n_seconds, resolution).mean(axis=1)
+
+
+def window_scores(motion, coverage, window: int, speech_weight: float = 0.5):
+    """Score of every ``window``-second span, indexed by its start second.
+
+    Motion is normalised to [0, 1] and blended with speech coverage; each
+    window's mean comes from prefix sums, so scoring is linear in the length.
+    """
+    n = len(motion)
+    if n == 0:
+        return np.zeros(0, dtype=np.float64)
+    window = max(min(int(window), n), 1)
+    peak = motion.max()
+    per_second = (1 - speech_weight) * (motion / peak if peak > 0 else motion) + speech_weight * coverage[:n]
+    prefix = np.concatenate(([0.0], np.cumsum(per_second)))
+    return (prefix[window:] - prefix[:-window]) / window
+
+
+def top_windows(scores, window: int, k: int, max_overlap: float = 0.0):
+    """Greedy non-maximum suppression: the ``k`` best starts whose windows
+    overlap each other by at most ``max_overlap`` of their length."""
+    scores = np.array(scores, dtype=np.float64)
+    min_gap = max(int(np.ceil(window * (1 - max_overlap))), 1)
+    picks = []
+    for _ in range(k):
+        if not len(scores) or np.isneginf(scores).all():
+            break
+        start = int(np.argmax(scores))
+        picks.append((start, float(scores[start])))
+        scores[max(start - min_gap + 1, 0):start + min_gap] = -np.inf
+    return picks
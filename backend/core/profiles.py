@@ -0,0 +1,74 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# x264 settings per profile; threads=None lets one encode use every core
+PROFILES = {
+    "quality": {"preset": "medium", "crf": 20, "threads": None},
+    "balanced": {"preset": "fast", "crf": 23, "threads": None},
+    # x264 scales poorly past a few threads, so several narrow encodes get
+    # more done than one wide one
+    "throughput": {"preset": "veryfast", "crf": 25, "threads": 2},
+}
+
+# profile used by the adaptive mode for up to this many active renders; the
+# slower "quality" preset is only used when asked for by name
+ADAPTIVE_PROFILES = [(2, "balanced"), (None, "throughput")]
+
+_active = 0
+_active_lock = threading.Lock()
+
+
+@contextmanager
+def rendering():
+    """Count the enclosed work as an active render."""
+    global _active
+    with _active_lock:
+        _active += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active -= 1
+
+
+def active_renders() -> int:
+    return _active
+
+
+class EncodingProfile:
+    def __init__(self, name, preset, crf, threads):
+        self.name = name
+        self.preset = preset
+        self.crf = crf
+        self.threads = threads
+
+    def video_args(self, threads=True):
+        """libx264 arguments; ``threads=False`` leaves the thread count to the
+        caller, as the parallel encoder splits it between chunks."""
+        args = ["-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf)]
+        return args + ["-threads", str(self.threads)] if threads else args
+
+    def __repr__(self):
+        return f"EncodingProfile({self.name!r}, preset={self.preset!r}, crf={self.crf}, threads={self.threads})"
+
+
+def encoding_profile(name: str = None) -> EncodingProfile:
+    """The profile for an encode starting now.
+
+    ``adaptive`` starts at ``balanced``, then picks a faster profile and
+    gives each render a smaller share of the cores as more renders run at once.
+    """
+    name = name or getattr(settings, "ENCODING_PROFILE", "adaptive")
+    cores = os.cpu_count() or 1
+    budget = cores
+    if name == "adaptive":
+        active = max(active_renders(), 1)
+        name = next(profile for limit, profile in ADAPTIVE_PROFILES if limit is None or active <= limit)
+        budget = max(cores // active, 1)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile: {name}")
+    profile = PROFILES[name]
+    return EncodingProfile(name, profile["preset"], profile["crf"], min(profile["threads"] or cores, budget))
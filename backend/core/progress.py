@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_job = contextvars.ContextVar("progress_job", default=None)
+
+# stage trackers publish at most this often, except when they reach 100%
+PUBLISH_INTERVAL_SECONDS = 0.5
+
+
+class ProgressBoard:
+    """Live progress of the jobs running in this process.
+
+    Every update bumps a version number and wakes the server-sent-event
+    streams waiting on that job, whether they wait in a thread or on an event
+    loop.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._waiters = set()
+
+    def _notify(self):
+        self._cond.notify_all()
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # the loop has been closed
+                pass
+
+    def update(self, job_id, stage=None, **fields):
+        with self._cond:
+            state = self._jobs.setdefault(job_id, {"version": 0, "stage": None, "stages": {}})
+            if fields:
+                state["stages"].setdefault(stage, {}).update(fields)
+            elif stage:
+                state["stage"] = stage
+            state["version"] += 1
+            self._notify()
+
+    def finish(self, job_id):
+        with self._cond:
+            self._jobs.pop(job_id, None)
+            self._notify()
+
+    def wait(self, job_id, after_version=0, timeout=None):
+        """Block until the job's progress moves past ``after_version``; returns
+        the new state, or ``None`` once the job is no longer running here."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                state = self._jobs.get(job_id)
+                if state is None or state["version"] > after_version:
+                    return _copy(state) if state else None
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return _copy(state)
+                self._cond.wait(remaining)
+
+    async def wait_async(self, job_id, after_version=0, timeout=None):
+        """``wait`` for async views, without holding a thread."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        loop = asyncio.get_running_loop()
+        while True:
+            event = asyncio.Event()
+            with self._cond:
+                state = self._jobs.get(job_id)
+                if state is None or state["version"] > after_version:
+                    return _copy(state) if state else None
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return _copy(state)
+                waiter = (loop, event)
+                self._waiters.add(waiter)
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    self._waiters.discard(waiter)
+
+
+def _copy(state):
+    return {**state, "stages": {name: dict(fields) for name, fields in state["stages"].items()}}
+
+
+board = ProgressBoard()
+
+
+@contextmanager
+def bind(job_id):
+    board.update(job_id)
+    token = _job.set(job_id)
+    try:
+        yield
+    finally:
+        _job.reset(token)
+        board.finish(job_id)
+
+
+def set_stage(stage):
+    job_id = _job.get()
+    if job_id is not None:
+        board.update(job_id, stage)
+
+
+class StageProgress:
+    """Percent complete and ETA of one stage, summed over its parts (for
+    example the chunks of a parallel encode)."""
+
+    def __init__(self, job_id, stage, total):
+        self.job_id = job_id
+        self.stage = stage
+        self.total = total
+        self.started = time.monotonic()
+        self._published = 0.0
+        self._parts = {}
+        self._lock = threading.Lock()
+        board.update(job_id, stage, percent=0.0, eta=None)
+
+    def update(self, done, part=0):
+        now = time.monotonic()
+        with self._lock:
+            self._parts[part] = max(min(done, self.total), 0)
+            fraction = min(sum(self._parts.values()) / self.total, 1.0)
+            if fraction < 1 and now - self._published < PUBLISH_INTERVAL_SECONDS:
+                return
+            self._published = now
+        elapsed = now - self.started
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        board.update(
+            self.job_id, self.stage,
+            percent=round(fraction * 100, 1),
+            eta=round(eta, 1) if eta is not None else None,
+        )
+
+
+def track(stage, total):
+    """Progress tracker for ``stage`` of the current job, or ``None`` outside a
+    job. ``total`` may be a callable so it is only computed when tracked."""
+    job_id = _job.get()
+    if job_id is None:
+        return None
+    total = total() if callable(total) else total
+    if not total or total <= 0:
+        return None
+    return StageProgress(job_id, stage, total)
@@ -4,22 +4,62 @@ from datetime import datetime
 
 class VideoIn(BaseModel):
     youtube_url: str
+    count: int = 1
+    duration: float = 30
 
 class VideoOut(BaseModel):
     id: int
     youtube_url: str
     title: Optional[str]
     short_video_file: Optional[str]
+    filter_name: str = ""
     created_at: datetime
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
 
+class VideoPageOut(BaseModel):
+    items: list[VideoOut]
+    next_cursor: Optional[str] = None
+
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    stage: str
+    stages: dict[str, str]
+    timings: dict[str, float]
+    result: dict = {}
+    error: Optional[str]
+    video_id: int
+    video: Optional[VideoOut]
+    videos: list[VideoOut] = []
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
 class FilterIn(BaseModel):
     filter_name: str
 
+class FilterBatchIn(BaseModel):
+    filter_names: list[str]
+
 class SubtitleStyle(BaseModel):
     font: str = "Impact"
     fontsize: int = 80
     bold: int = 400
-    color: str = "#FF0000"
\ No newline at end of file
+    color: str = "#FF0000"
+    soft: bool = False
+
+class FilterPreviewIn(FilterIn):
+    mode: str = "clip"
+    start: float = 0
+
+class SubtitlePreviewIn(SubtitleStyle):
+    mode: str = "clip"
+    start: Optional[float] = None
+
+class PreviewOut(BaseModel):
+    video_id: int
+    mode: str
+    preview_file: str
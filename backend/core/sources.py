@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import yt_dlp
+from django.conf import settings
+
+from .progress import track
+
+try:
+    import fcntl
+except ImportError:  # Windows: leases are only tracked per process
+    fcntl = None
+
+_YOUTUBE_ID = re.compile(r"(?:v=|youtu\.be/|shorts/|embed/|live/)([A-Za-z0-9_-]{11})")
+
+
+def source_key(url: str, fmt: str) -> str:
+    match = _YOUTUBE_ID.search(url)
+    video_key = match.group(1) if match else hashlib.sha1(url.encode()).hexdigest()[:16]
+    return f"{video_key}_{hashlib.sha1(fmt.encode()).hexdigest()[:8]}"
+
+
+class Source:
+    def __init__(self, key):
+        self.key = key
+        self.path = None
+        self.title = ""
+        self.yt_id = None
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.ready = threading.Event()
+        self.error = None
+        self.lease_file = None
+
+
+class SourceStore:
+    """Downloaded sources shared between jobs, keyed by video id and format.
+
+    Concurrent requests for the same source wait on a single in-flight
+    download; finished sources are reference counted and removed once they
+    have been unused for ``SOURCE_CACHE_TTL_SECONDS``. A process holds a
+    shared lock on the source's lease file while it knows the source, so other
+    processes sharing the directory never sweep it away.
+    """
+
+    def __init__(self, root=None):
+        self._root = root
+        self._lock = threading.Lock()
+        self._sources = {}
+
+    @property
+    def root(self):
+        return self._root or os.path.join(settings.MEDIA_ROOT, "sources")
+
+    @property
+    def ttl(self):
+        return getattr(settings, "SOURCE_CACHE_TTL_SECONDS", 60 * 60)
+
+    def _meta_path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def _lock_lease(self, key, exclusive=False):
+        """Open the key's lease file holding a shared lock, or try for an
+        exclusive one and return ``None`` when another process holds a lease."""
+        if fcntl is None:
+            return None
+        operation = fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{key}.lease")
+        while True:
+            f = open(path, "a+b")
+            try:
+                fcntl.flock(f, operation)
+            except BlockingIOError:
+                f.close()
+                return None
+            try:
+                # a sweeper may have removed the file before it was locked
+                if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    @staticmethod
+    def _drop_lease(source):
+        if source.lease_file is not None:
+            source.lease_file.close()
+            source.lease_file = None
+
+    def _load_existing(self, source):
+        try:
+            with open(self._meta_path(source.key), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if not os.path.exists(meta.get("path", "")):
+            return False
+        source.path, source.title, source.yt_id = meta["path"], meta.get("title", ""), meta.get("id")
+        return True
+
+    def _download(self, url, fmt, source):
+        os.makedirs(self.root, exist_ok=True)
+        tracker = None
+
+        def on_progress(d):
+            nonlocal tracker
+            if tracker is None:
+                tracker = track("download", d.get("total_bytes") or d.get("total_bytes_estimate"))
+            if tracker is not None and d.get("downloaded_bytes") is not None:
+                tracker.update(d["downloaded_bytes"])
+
+        ydl_opts = {
+            'format': fmt,
+            'outtmpl': os.path.join(self.root, f"{source.key}.%(ext)s"),
+            'noplaylist': True,
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'continuedl': True,
+            'retries': 3,
+            'enable_file_urls': getattr(settings, "SOURCE_ALLOW_FILE_URLS", False),
+            'progress_hooks': [on_progress],
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(str(url), download=True)
+            source.path = ydl.prepare_filename(info)
+            source.title = info.get("title", "")
+            source.yt_id = info.get("id")
+
+        with open(self._meta_path(source.key), "w", encoding="utf-8") as f:
+            json.dump({"path": source.path, "title": source.title, "id": source.yt_id}, f)
+
+    def acquire(self, url: str, fmt: str = None) -> Source:
+        fmt = fmt or getattr(settings, "SOURCE_FORMAT", "best[height<=480][ext=mp4]")
+        key = source_key(url, fmt)
+        with self._lock:
+            source = self._sources.get(key)
+            if source and source.ready.is_set() and not source.refs and not os.path.exists(source.path or ""):
+                self._drop_lease(source)
+                source = None
+            owner = source is None
+            if owner:
+                source = self._sources[key] = Source(key)
+                source.lease_file = self._lock_lease(key)
+            source.refs += 1
+
+        if not owner:
+            source.ready.wait()
+            if source.error is not None:
+                raise source.error
+            return source
+
+        try:
+            if not self._load_existing(source):
+                self._download(url, fmt, source)
+        except BaseException as e:
+            with self._lock:
+                del self._sources[key]
+                self._drop_lease(source)
+            source.error = e
+            raise
+        finally:
+            source.ready.set()
+        return source
+
+    def release(self, source: Source):
+        with self._lock:
+            source.refs -= 1
+            source.last_used = time.monotonic()
+        self.sweep()
+
+    def sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                s for s in self._sources.values()
+                if s.refs == 0 and s.ready.is_set() and now - s.last_used > self.ttl
+            ]
+            for source in expired:
+                del self._sources[source.key]
+                self._drop_lease(source)
+
+        if not os.path.isdir(self.root):
+            return 0
+
+        # a source owns every file named after its key (media, metadata,
+        # decoded audio, lease); sources no process holds expire by age
+        expired_keys = {source.key for source in expired}
+        cutoff = time.time() - self.ttl
+        files = {}
+        for name in os.listdir(self.root):
+            files.setdefault(name.split(".", 1)[0], []).append(os.path.join(self.root, name))
+        removed = 0
+        for key, paths in files.items():
+            # checked per key under the lock, so a source acquired again since
+            # the listing keeps its files
+            with self._lock:
+                if key in self._sources:
+                    continue
+                lease = self._lock_lease(key, exclusive=True)
+                if lease is None and fcntl is not None:
+                    # another process holds it
+                    continue
+                try:
+                    if key not in expired_keys and max(_mtime(path) for path in paths) >= cutoff:
+                        continue
+                    # with the lease file, which the attempt above may have created
+                    for path in {*paths, os.path.join(self.root, f"{key}.lease")}:
+                        try:
+                            os.remove(path)
+                            removed += not path.endswith(".lease")
+                        except FileNotFoundError:
+                            pass
+                finally:
+                    if lease is not None:
+                        lease.close()
+        return removed
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+source_store = SourceStore()
@@ -1,3 +1,623 @@
-from django.test import TestCase
+import asyncio
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils.http import http_date
+from ninja.errors import HttpError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .aio import run_blocking
+from .api import _decode_cursor, _encode_cursor
+from .encoder import FFmpegSlots, encode_video, plan_chunks
+from .janitor import run_janitor
+from .media import _byte_range, _verify, signed_media_url
+from .media_cache import evict_lru
+from .models import YouTubeVideo
+from .sources import SourceStore, fcntl, source_key
+from .motion import top_windows, window_scores
+from .utils import FILTERS, _branch_graph, apply_filters_to_video
+
+
+class WindowScoresTests(SimpleTestCase):
+    def test_means_of_blended_seconds(self):
+        motion = np.array([0.0, 2.0, 4.0, 0.0])
+        coverage = np.array([1.0, 0.0, 0.0, 1.0])
+        scores = window_scores(motion, coverage, 2, speech_weight=0.5)
+        # per second: 0.5, 0.25, 0.5, 0.5
+        np.testing.assert_allclose(scores, [0.375, 0.375, 0.5])
+
+    def test_window_longer_than_video_is_one_window(self):
+        scores = window_scores(np.array([1.0, 3.0]), np.zeros(2), 10, speech_weight=0.0)
+        np.testing.assert_allclose(scores, [2 / 3])
+
+    def test_still_video_scores_on_speech(self):
+        scores = window_scores(np.zeros(3), np.array([0.0, 1.0, 1.0]), 1, speech_weight=0.5)
+        np.testing.assert_allclose(scores, [0.0, 0.5, 0.5])
+
+    def test_empty(self):
+        self.assertEqual(len(window_scores(np.zeros(0), np.zeros(0), 5)), 0)
+
+
+class TopWindowsTests(SimpleTestCase):
+    def test_picks_do_not_overlap(self):
+        scores = [0.1, 0.9, 0.8, 0.2, 0.7, 0.3]
+        self.assertEqual([start for start, _ in top_windows(scores, 2, 3)], [1, 4])
+
+    def test_allowed_overlap(self):
+        scores = [0.1, 0.9, 0.8, 0.2, 0.7, 0.3]
+        picks = top_windows(scores, 2, 3, max_overlap=0.5)
+        self.assertEqual([start for start, _ in picks], [1, 2, 4])
+        self.assertEqual(picks[0][1], 0.9)
+
+    def test_stops_when_nothing_is_left(self):
+        self.assertEqual(len(top_windows([0.5, 0.4], 5, 3)), 1)
+        self.assertEqual(top_windows([], 5, 3), [])
+
+
+class MyVideosTests(TestCase):
+    url = "/api/core/my-videos"
+
+    def setUp(self):
+        self.user = User.objects.create_user("owner", password="pw")
+        self.videos = [
+            YouTubeVideo.objects.create(user=self.user, youtube_url=f"https://youtu.be/{i:011d}", title=f"v{i}")
+            for i in range(3)
+        ]
+        self.auth = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def get(self, headers=None, **params):
+        return self.client.get(self.url, params, headers={**self.auth, **(headers or {})})
+
+    def test_cursor_round_trip(self):
+        video = self.videos[0]
+        self.assertEqual(_decode_cursor(_encode_cursor(video)), (video.created_at, video.id))
+
+    def test_bad_cursor(self):
+        for cursor in ("not-a-cursor", _encode_cursor(self.videos[0])[:-4]):
+            with self.assertRaises(HttpError):
+                _decode_cursor(cursor)
+        self.assertEqual(self.get(cursor="not-a-cursor").status_code, 400)
+
+    def test_pages_newest_first(self):
+        first = self.get(limit=2).json()
+        self.assertEqual([item["id"] for item in first["items"]], [self.videos[2].id, self.videos[1].id])
+        rest = self.get(limit=2, cursor=first["next_cursor"]).json()
+        self.assertEqual([item["id"] for item in rest["items"]], [self.videos[0].id])
+        self.assertIsNone(rest["next_cursor"])
+
+    def test_etag_revalidation(self):
+        etag = self.get()["ETag"]
+        not_modified = self.get({"If-None-Match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], etag)
+
+        self.videos[1].title = "renamed"
+        self.videos[1].save()
+        self.assertEqual(self.get({"If-None-Match": etag}).status_code, 200)
+
+    def test_deleted_row_changes_etag(self):
+        etag = self.get()["ETag"]
+        self.videos[0].delete()
+        self.assertNotEqual(self.get({"If-None-Match": etag})["ETag"], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.get()["Last-Modified"]
+        self.assertEqual(self.get({"If-Modified-Since": last_modified}).status_code, 304)
+        # If-None-Match wins over a date that still matches
+        response = self.get({"If-Modified-Since": last_modified, "If-None-Match": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+
+class MetricsTests(TestCase):
+    url = "/api/metrics"
+
+    def setUp(self):
+        self.user = User.objects.create_user("viewer", password="pw")
+
+    def get(self, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return self.client.get(self.url, headers=headers)
+
+    def test_staff_only_without_token(self):
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get(AccessToken.for_user(self.user)).status_code, 401)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.get(AccessToken.for_user(self.user)).status_code, 200)
+
+    def test_scrape_token(self):
+        with self.settings(METRICS_TOKEN="scrape"):
+            self.assertEqual(self.get().status_code, 401)
+            self.assertEqual(self.get("wrong").status_code, 401)
+            self.assertEqual(self.get("scrape").status_code, 200)
+
+
+class SignedMediaTests(SimpleTestCase):
+    def signed(self, name, user_id=7):
+        request = RequestFactory().get("/")
+        request.user = User(id=user_id)
+        url = urlsplit(signed_media_url(request, name))
+        return RequestFactory().get(url.path, QUERY_STRING=url.query)
+
+    def test_signed_url_verifies(self):
+        self.assertTrue(_verify(self.signed("shorts/a.mp4"), "shorts/a.mp4"))
+
+    def test_signature_is_bound_to_file_and_user(self):
+        self.assertFalse(_verify(self.signed("shorts/a.mp4"), "shorts/b.mp4"))
+        request = self.signed("shorts/a.mp4")
+        request.GET = request.GET.copy()
+        request.GET["u"] = "8"
+        self.assertFalse(_verify(request, "shorts/a.mp4"))
+
+    def test_expired_or_missing(self):
+        with mock.patch("core.media.time.time", return_value=1_000_000.0):
+            request = self.signed("shorts/a.mp4")
+        self.assertFalse(_verify(request, "shorts/a.mp4"))
+        self.assertFalse(_verify(RequestFactory().get("/media/shorts/a.mp4"), "shorts/a.mp4"))
+
+
+class ByteRangeTests(SimpleTestCase):
+    etag = '"abc"'
+    mtime = 1_700_000_000.0
+
+    def byte_range(self, size=1000, **headers):
+        return _byte_range(RequestFactory().get("/", headers=headers), self.etag, self.mtime, size)
+
+    def test_no_range_is_the_whole_file(self):
+        self.assertIsNone(self.byte_range())
+
+    def test_ranges(self):
+        self.assertEqual(self.byte_range(Range="bytes=0-99"), (0, 99))
+        self.assertEqual(self.byte_range(Range="bytes=900-"), (900, 999))
+        self.assertEqual(self.byte_range(Range="bytes=-100"), (900, 999))
+        self.assertEqual(self.byte_range(Range="bytes=-5000"), (0, 999))
+        self.assertEqual(self.byte_range(Range="bytes=500-5000"), (500, 999))
+
+    def test_unsatisfiable(self):
+        self.assertIs(self.byte_range(Range="bytes=1000-"), False)
+        self.assertIs(self.byte_range(Range="bytes=-0"), False)
+        self.assertIs(self.byte_range(size=0, Range="bytes=0-"), False)
+
+    def test_ignored_ranges_send_the_whole_file(self):
+        self.assertIsNone(self.byte_range(Range="bytes=500-100"))
+        self.assertIsNone(self.byte_range(Range="bytes=0-1,5-9"))
+        self.assertIsNone(self.byte_range(Range="items=0-1"))
+
+    def test_if_range(self):
+        self.assertEqual(self.byte_range(Range="bytes=0-9", If_Range=self.etag), (0, 9))
+        self.assertEqual(self.byte_range(Range="bytes=0-9", If_Range=http_date(self.mtime)), (0, 9))
+        self.assertIsNone(self.byte_range(Range="bytes=0-9", If_Range='"other"'))
+        self.assertIsNone(self.byte_range(Range="bytes=0-9", If_Range=http_date(self.mtime + 60)))
+
+
+class MediaTestCase(TestCase):
+    """Runs against an empty MEDIA_ROOT of its own."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = self.settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user("owner", password="pw")
+
+    def write(self, name, size=10, age=0):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        if age:
+            mtime = os.path.getmtime(path) - age
+            os.utime(path, (mtime, mtime))
+        return path
+
+
+class EvictLruTests(MediaTestCase):
+    def test_oldest_go_first(self):
+        old, mid, new = (self.write(f"shorts/v_filter_{name}.mp4", age=age)
+            for name, age in (("a", 30), ("b", 20), ("c", 10)))
+        self.assertEqual(evict_lru("filter", [old, mid, new], 20), 10)
+        self.assertEqual([os.path.exists(p) for p in (old, mid, new)], [False, True, True])
+
+    def test_kept_and_referenced_files_stay(self):
+        shown = self.write("shorts/v_filter_a.mp4", age=30)
+        kept = self.write("shorts/v_filter_b.mp4", age=20)
+        spare = self.write("shorts/v_filter_c.mp4", age=10)
+        YouTubeVideo.objects.create(user=self.user, youtube_url="https://youtu.be/aaaaaaaaaaa",
+            short_video_file="shorts/v_filter_a.mp4")
+        evict_lru("filter", [shown, kept, spare], 0, keep={kept})
+        self.assertEqual([os.path.exists(p) for p in (shown, kept, spare)], [True, True, False])
+
+
+
+class JanitorTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        YouTubeVideo.objects.create(user=self.user, youtube_url="https://youtu.be/aaaaaaaaaaa",
+            short_video_file="shorts/v_filter_sepia_subtitled.mp4")
+
+    def exists(self, *paths):
+        return [os.path.exists(p) for p in paths]
+
+    def test_referenced_files_and_masters_stay(self):
+        shown = self.write("shorts/v_filter_sepia_subtitled.mp4", age=7200)
+        master = self.write("shorts/v.mp4", age=7200)
+        report = run_janitor(budget_bytes=0, min_age_seconds=60)
+        self.assertEqual(self.exists(shown, master), [True, True])
+        self.assertEqual(report["reclaimed_bytes"], 0)
+
+    def test_orphans_and_intermediates_past_min_age(self):
+        orphan = self.write("shorts/w.mp4", age=7200)
+        fresh_orphan = self.write("shorts/x.mp4", age=10)
+        temp = self.write("temp/v_temp_0123abcd.mp4", age=7200)
+        fresh_temp = self.write("shorts/v_temp_89abcdef.mp4", age=10)
+        work = self.write("shorts/chunks_1234/part0.mp4", age=7200)
+        report = run_janitor(min_age_seconds=60)
+        self.assertEqual(self.exists(orphan, fresh_orphan, temp, fresh_temp, work), [False, True, False, True, False])
+        self.assertFalse(os.path.exists(os.path.dirname(work)))
+        self.assertEqual(report["orphan"], {"files": 1, "bytes": 10})
+        self.assertEqual(report["intermediate"], {"files": 2, "bytes": 20})
+
+    def test_cache_evicted_oldest_first_over_budget(self):
+        self.write("shorts/v_filter_sepia_subtitled.mp4", size=100, age=7200)
+        oldest = self.write("shorts/v_filter_gray.mp4", size=50, age=7200)
+        older = self.write("shorts/v_filter_blur.mp4", size=50, age=3600)
+        fresh = self.write("shorts/v_filter_sharpen.mp4", size=50, age=10)
+        report = run_janitor(budget_bytes=160, min_age_seconds=60)
+        self.assertEqual(self.exists(oldest, older, fresh), [False, False, True])
+        self.assertEqual(report["cache"], {"files": 2, "bytes": 100})
+        self.assertEqual(report["total_bytes"], 150)
+
+    def test_under_budget_keeps_cache(self):
+        cached = self.write("shorts/v_filter_gray.mp4", size=50, age=7200)
+        run_janitor(budget_bytes=1000, min_age_seconds=60)
+        self.assertTrue(os.path.exists(cached))
+
+    def test_dry_run_removes_nothing(self):
+        orphan = self.write("shorts/w.mp4", age=7200)
+        cached = self.write("shorts/v_filter_gray.mp4", age=7200)
+        with mock.patch("core.janitor.source_store.sweep") as sweep:
+            report = run_janitor(budget_bytes=0, min_age_seconds=60, dry_run=True)
+        sweep.assert_not_called()
+        self.assertEqual(self.exists(orphan, cached), [True, True])
+        self.assertEqual(report["orphan"]["files"], 1)
+        self.assertEqual(report["cache"]["files"], 1)
+
+
+
+class BranchGraphTests(SimpleTestCase):
+    def test_simple_chain(self):
+        self.assertEqual(_branch_graph(FILTERS["grayscale"], 2), "[s2]hue=s=0[o2]")
+
+    def test_internal_labels_are_prefixed(self):
+        graph = _branch_graph(FILTERS["lightning"], 1)
+        self.assertTrue(graph.startswith("[s1]split[f1_base][f1_flash];[f1_flash]"))
+        self.assertTrue(graph.endswith("[f1_base][f1_light]overlay[o1]"))
+
+
+@unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "needs ffmpeg")
+class ApplyFiltersTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, "shorts"))
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc2=size=160x120:rate=25",
+            "-f", "lavfi", "-i", "sine", "-t", "1", "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac",
+            os.path.join(self.media_root, "shorts", "v.mp4"),
+        ], check=True)
+
+    def chroma(self, name):
+        """How far the first frame's chroma strays from neutral grey."""
+        raw = subprocess.run([
+            "ffmpeg", "-v", "error", "-i", os.path.join(self.media_root, name),
+            "-frames:v", "1", "-f", "rawvideo", "-pix_fmt", "yuv420p", "-",
+        ], check=True, capture_output=True).stdout
+        uv = np.frombuffer(raw[160 * 120:], dtype=np.uint8).astype(int)
+        return int(np.abs(uv - 128).max())
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_each_filter_gets_its_own_output(self):
+        result = apply_filters_to_video("shorts/v.mp4", ["grayscale", "sepia", "lightning", "grayscale"])
+        self.assertEqual(result["files"], {
+            "grayscale": "shorts/v_filter_grayscale.mp4",
+            "sepia": "shorts/v_filter_sepia.mp4",
+            "lightning": "shorts/v_filter_lightning.mp4",
+        })
+        self.assertEqual(result["rendered"], ["grayscale", "sepia", "lightning"])
+        self.assertIn("batch.total", result["timings"])
+        self.assertLessEqual(self.chroma(result["files"]["grayscale"]), 2)
+        self.assertGreater(self.chroma(result["files"]["sepia"]), 2)
+        self.assertFalse([name for name in os.listdir(os.path.join(self.media_root, "shorts")) if "_temp_" in name])
+
+    def test_cached_outputs_are_not_rendered_again(self):
+        apply_filters_to_video("shorts/v.mp4", ["grayscale"])
+        result = apply_filters_to_video("shorts/v.mp4", ["grayscale", "sepia"])
+        self.assertEqual(result["rendered"], ["sepia"])
+        result = apply_filters_to_video("shorts/v_filter_sepia.mp4", ["sepia", "grayscale"])
+        self.assertEqual(result["rendered"], [])
+        self.assertEqual(result["timings"], {})
+
+    def test_eviction_spares_outputs_and_kept_names(self):
+        with self.settings(FILTER_CACHE_MAX_BYTES=1):
+            apply_filters_to_video("shorts/v.mp4", ["grayscale"])
+            apply_filters_to_video("shorts/v.mp4", ["sepia", "vignette"], keep=("shorts/v_filter_grayscale.mp4",))
+            self.assertTrue(all(map(self.exists, (
+                "shorts/v_filter_grayscale.mp4", "shorts/v_filter_sepia.mp4", "shorts/v_filter_vignette.mp4"))))
+            apply_filters_to_video("shorts/v.mp4", ["warm"])
+        self.assertEqual([self.exists(f"shorts/v_filter_{name}.mp4") for name in ("grayscale", "sepia", "vignette", "warm")],
+            [False, False, False, True])
+        self.assertTrue(self.exists("shorts/v.mp4"))
+
+    def test_unknown_filter(self):
+        with self.assertRaises(ValueError):
+            apply_filters_to_video("shorts/v.mp4", ["grayscale", "nope"])
+
+
+class PlanChunksTests(SimpleTestCase):
+    def test_cuts_at_nearest_keyframes(self):
+        keyframes = [0, 4, 8, 9.5, 16, 21, 26]
+        self.assertEqual(plan_chunks(0, 30, keyframes, 3, 5), [(0, 9.5), (9.5, 21), (21, 30)])
+        self.assertEqual(plan_chunks(7, 30, [k + 7 for k in keyframes], 3, 5), [(7, 16.5), (16.5, 28), (28, 37)])
+
+    def test_chunks_keep_min_length(self):
+        # every cut lies min_chunk inside the span and min_chunk after the previous one
+        self.assertEqual(plan_chunks(0, 30, [0, 2, 10, 11, 12, 28], 3, 5), [(0, 10), (10, 30)])
+
+    def test_no_keyframe_to_cut_at(self):
+        self.assertEqual(plan_chunks(0, 30, [0, 2, 29], 3, 5), [(0, 30)])
+        self.assertEqual(plan_chunks(0, 30, [], 3, 5), [(0, 30)])
+
+
+@mock.patch("core.encoder.keyframe_times", return_value=[0, 3])
+@mock.patch("core.encoder._encode_single")
+class EncodeFallbackTests(SimpleTestCase):
+    def encode(self, **kwargs):
+        with self.settings(PARALLEL_ENCODE_MIN_SECONDS=20, PARALLEL_ENCODE_CHUNK_SECONDS=5):
+            encode_video("in.mp4", "out.mp4", [], [], [], **{"duration": 30, "workers": 4, **kwargs})
+
+    def test_single_worker(self, single, keyframes):
+        self.encode(workers=1)
+        single.assert_called_once()
+        keyframes.assert_not_called()
+
+    def test_frame_counting_graph(self, single, keyframes):
+        self.encode(graph="fade=in:0:30")
+        single.assert_called_once()
+        keyframes.assert_not_called()
+
+    def test_short_span(self, single, keyframes):
+        self.encode(duration=15)
+        single.assert_called_once()
+        keyframes.assert_not_called()
+
+    def test_no_keyframe_to_cut_at(self, single, keyframes):
+        self.encode()
+        single.assert_called_once()
+        keyframes.assert_called_once_with("in.mp4", 0, 30)
+
+@unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "needs ffmpeg")
+class ChunkedEncodeTests(SimpleTestCase):
+    video_args = ["-c:v", "libx264", "-preset", "ultrafast", "-qp", "0", "-pix_fmt", "yuv420p"]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def source(self, rate, gop):
+        path = os.path.join(self.dir, f"source_{gop}.mp4")
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"testsrc2=size=160x120:rate={rate}",
+            "-f", "lavfi", "-i", "sine", "-t", "45",
+            "-c:v", "libx264", "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", path,
+        ], check=True)
+        return path
+
+    def frames(self, path):
+        out = subprocess.run(["ffmpeg", "-v", "error", "-i", path, "-map", "0:v", "-f", "framemd5", "-"],
+            check=True, capture_output=True).stdout.decode()
+        return [line.rsplit(",", 1)[1].strip() for line in out.splitlines() if line and not line.startswith("#")]
+
+    def encode(self, source, start, workers):
+        output = os.path.join(self.dir, f"out_{workers}.mp4")
+        with self.settings(PARALLEL_ENCODE_MIN_SECONDS=20, PARALLEL_ENCODE_CHUNK_SECONDS=5):
+            encode_video(source, output, [], self.video_args, ["-c:a", "aac"], start=start, duration=30,
+                workers=workers)
+        return self.frames(output)
+
+    def test_chunks_match_a_single_encode(self):
+        for rate, gop, start in (("30000/1001", 45, 7), ("30000/1001", 45, 7.37), ("25", 50, 3.3)):
+            with self.subTest(rate=rate, start=start):
+                source = self.source(rate, gop)
+                single, chunked = self.encode(source, start, 1), self.encode(source, start, 3)
+                self.assertEqual(len(chunked), len(single))
+                self.assertEqual(chunked[0], single[0])
+                # lossless, so every frame is a source frame: consecutive, none twice or skipped
+                index = {frame: i for i, frame in enumerate(self.frames(source))}
+                positions = [index[frame] for frame in chunked]
+                self.assertEqual(positions, list(range(positions[0], positions[0] + len(positions))))
+
+
+class FFmpegSlotsTests(SimpleTestCase):
+    def test_waiting_coroutines_hold_no_threads(self):
+        slots = FFmpegSlots(1)
+        slots.acquire()
+
+        async def main():
+            waiters = [asyncio.ensure_future(slots.acquire_async()) for _ in range(8)]
+            # more waiters than blocking threads, and the pool still runs work
+            self.assertEqual(await asyncio.wait_for(run_blocking(lambda: 42), 5), 42)
+            self.assertFalse(any(waiter.done() for waiter in waiters))
+            for waiter in waiters:
+                slots.release()
+                await asyncio.wait_for(waiter, 5)
+
+        asyncio.run(main())
+        slots.release()
+        self.assertEqual(slots.free, 1)
+
+    def test_first_come_first_served_across_threads_and_loops(self):
+        slots = FFmpegSlots(1)
+        slots.acquire()
+        order = []
+
+        def thread_waiter():
+            with slots:
+                order.append("thread")
+
+        async def async_waiter():
+            await slots.acquire_async()
+            order.append("async")
+            slots.release()
+
+        thread = threading.Thread(target=thread_waiter)
+        thread.start()
+        while not slots._waiters:
+            time.sleep(0.01)
+        loop_thread = threading.Thread(target=asyncio.run, args=(async_waiter(),))
+        loop_thread.start()
+        while len(slots._waiters) < 2:
+            time.sleep(0.01)
+        slots.release()
+        thread.join(5)
+        loop_thread.join(5)
+        self.assertEqual(order, ["thread", "async"])
+        self.assertEqual(slots.free, 1)
+
+    def test_cancelled_waiters_give_their_slot_on(self):
+        slots = FFmpegSlots(1)
+
+        async def main():
+            await slots.acquire_async()
+            cancelled = asyncio.ensure_future(slots.acquire_async())
+            handed = asyncio.ensure_future(slots.acquire_async())
+            last = asyncio.ensure_future(slots.acquire_async())
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            # granted on release but cancelled before it ran
+            slots.release()
+            handed.cancel()
+            await asyncio.wait_for(last, 5)
+            self.assertTrue(cancelled.cancelled() and handed.cancelled())
+            slots.release()
+
+        asyncio.run(main())
+        self.assertEqual(slots.free, 1)
+
+    def test_over_release(self):
+        with self.assertRaises(ValueError):
+            FFmpegSlots(1).release()
+
+
+class SourceStoreTests(SimpleTestCase):
+    url = "https://youtu.be/aaaaaaaaaaa"
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.store = SourceStore(self.root)
+        self.key = source_key(self.url, "mp4")
+        self.gate = threading.Event()
+        self.gate.set()
+        self.error = None
+        patcher = mock.patch.object(self.store, "_download", side_effect=self.download)
+        self.downloads = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def download(self, url, fmt, source):
+        self.gate.wait(5)
+        if self.error:
+            raise self.error
+        source.path = self.write(f"{source.key}.mp4")
+
+    def write(self, name, age=0):
+        path = os.path.join(self.root, name)
+        with open(path, "wb") as f:
+            f.write(b"x")
+        if age:
+            mtime = time.time() - age
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def acquire_concurrently(self, count):
+        self.gate.clear()
+        results = []
+
+        def acquire():
+            try:
+                results.append(self.store.acquire(self.url, "mp4"))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=acquire) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        while not (self.key in self.store._sources and self.store._sources[self.key].refs == count):
+            time.sleep(0.01)
+        self.gate.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_concurrent_acquires_share_one_download(self):
+        results = self.acquire_concurrently(4)
+        self.assertEqual(self.downloads.call_count, 1)
+        self.assertEqual(len({id(source) for source in results}), 1)
+        self.assertEqual(results[0].refs, 4)
+
+    def test_failed_download_reaches_every_waiter(self):
+        self.error = RuntimeError("unavailable")
+        results = self.acquire_concurrently(3)
+        self.assertEqual(results, [self.error] * 3)
+        self.assertNotIn(self.key, self.store._sources)
+        self.error = None
+        self.assertTrue(os.path.exists(self.store.acquire(self.url, "mp4").path))
+        self.assertEqual(self.downloads.call_count, 2)
+
+    def test_release_keeps_the_source_until_it_expires(self):
+        source = self.store.acquire(self.url, "mp4")
+        self.store.release(source)
+        self.assertIs(self.store.acquire(self.url, "mp4"), source)
+        self.assertEqual(self.downloads.call_count, 1)
+
+        with self.settings(SOURCE_CACHE_TTL_SECONDS=0):
+            # still referenced once
+            self.assertEqual(self.store.sweep(), 0)
+            self.store.release(source)
+        self.assertFalse(os.path.exists(source.path))
+        self.assertNotIn(self.key, self.store._sources)
+
+    def test_sweep_removes_unheld_files_by_age(self):
+        stale = [self.write("old_key.mp4", age=120), self.write("old_key.pcm", age=120)]
+        fresh = self.write("new_key.mp4")
+        with self.settings(SOURCE_CACHE_TTL_SECONDS=60):
+            self.assertEqual(self.store.sweep(), 2)
+        self.assertEqual([os.path.exists(p) for p in (*stale, fresh)], [False, False, True])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "old_key.lease")))
+
+    @unittest.skipIf(fcntl is None, "needs fcntl")
+    def test_sweep_spares_sources_another_process_holds(self):
+        path = self.write(f"{self.key}.mp4", age=120)
+        # a second store stands in for another worker process sharing the directory
+        other = SourceStore(self.root)
+        lease = other._lock_lease(self.key)
+        mtime = time.time() - 120
+        os.utime(os.path.join(self.root, f"{self.key}.lease"), (mtime, mtime))
+        with self.settings(SOURCE_CACHE_TTL_SECONDS=60):
+            self.assertEqual(self.store.sweep(), 0)
+            self.assertTrue(os.path.exists(path))
+            lease.close()
+            self.assertEqual(self.store.sweep(), 1)
+        self.assertFalse(os.path.exists(path))
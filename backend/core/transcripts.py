@@ -0,0 +1,69 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.db import IntegrityError
+
+from .audio import extract_pcm, load_pcm
+from .metrics import measure
+from .models import Transcript
+from .whisper_models import whisper_models
+
+
+def content_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_transcript(path: str, model_name: str = None) -> Transcript:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Media not found: {path}")
+
+    model_name = model_name or getattr(settings, "WHISPER_MODEL", "base")
+    pcm_path = extract_pcm(path)
+    digest = content_hash(pcm_path)
+
+    transcript = Transcript.objects.filter(content_hash=digest, model_name=model_name).first()
+    if transcript:
+        return transcript
+
+    with measure("transcribe"):
+        result = whisper_models.transcribe(load_pcm(pcm_path), model_name, verbose=False)
+    segments = [
+        {"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"]}
+        for seg in result["segments"]
+    ]
+    try:
+        return Transcript.objects.create(
+            content_hash=digest,
+            model_name=model_name,
+            language=result.get("language"),
+            segments=segments,
+        )
+    except IntegrityError:
+        return Transcript.objects.get(content_hash=digest, model_name=model_name)
+
+
+def clip_segments(segments, start: float, duration: float = None):
+    end = start + duration if duration is not None else float("inf")
+    clipped = []
+    for seg in segments:
+        if seg["end"] <= start or seg["start"] >= end:
+            continue
+        clipped.append({
+            "start": max(seg["start"], start) - start,
+            "end": min(seg["end"], end) - start,
+            "text": seg["text"],
+        })
+    return clipped
+
+
+def video_segments(video):
+    if video.transcript_id and video.clip_start is not None:
+        return clip_segments(video.transcript.segments, video.clip_start, video.clip_duration)
+
+    path = os.path.join(settings.MEDIA_ROOT, (video.original_short_video_file or video.short_video_file).name)
+    return get_transcript(path).segments
@@ -1,12 +1,22 @@
 import os
+import json
+import hashlib
 import subprocess
-import yt_dlp
 from django.conf import settings
-import cv2
-import numpy as np
-import whisper
 import uuid
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from .transcripts import get_transcript, clip_segments
+from .aio import run_blocking
+from .encoder import encode_video, probe_video, run_ffmpeg, run_ffmpeg_async
+from .media_cache import cache_hit, evict_lru
+from .metrics import measure, submit
+from .progress import track
+from .profiles import encoding_profile
+from .motion import frame_diffs, motion_per_second, speech_coverage, window_scores, top_windows
 
 
 def _ensure_dir(path):
@@ -14,78 +24,117 @@ def _ensure_dir(path):
     return path
 
 
-def find_best_start(filepath: str, fps: int = 30):
-    model = whisper.load_model("base")
-    result = model.transcribe(filepath, verbose=False)
-    speech_times = [(int(seg['start']), int(seg['end'])) for seg in result['segments']]
-
-
-    cap = cv2.VideoCapture(filepath)
-    fps = cap.get(cv2.CAP_PROP_FPS) or fps
-    frames_diff = []
-
-    ret, prev = cap.read()
-    if not ret:
-        cap.release()
-        return 0
-
-    prev_gray = cv2.cvtColor(prev, cv2.COLOR_BGR2GRAY)
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        diff = cv2.absdiff(prev_gray, gray)
-        frames_diff.append(np.sum(diff))
-        prev_gray = gray
-
-    cap.release()
-
-    motion_per_second = []
-    frames_per_second = int(fps)
-    for i in range(0,len(frames_diff),frames_per_second):
-        segment = frames_diff[i:i + frames_per_second]
-        motion_per_second.append(np.mean(segment))
-    best_score = -1
-    best_time = 0
-
-    for sec, motion in enumerate(motion_per_second):
-        if any(start <= sec <= end for start, end in speech_times):
-            score = motion
-            if score > best_score:
-                best_score = score
-                best_time = sec
-    return max(best_time-4,0)
-
-
-def download_youtube_video(url: str, video_id: int):
-    temp_dir = _ensure_dir(os.path.join(settings.MEDIA_ROOT, 'temp'))
-    out_template = os.path.join(temp_dir, f"{video_id}_%(id)s.%(ext)s")
-
-    ydl_opts = {
-        'format': 'best[height<=480][ext=mp4]',
-        'outtmpl': out_template,
-        'noplaylist': True,
-        'quiet': True,
-        'no_warnings': True,
-        'continuedl': True,
-        'retries': 3,
+def reframe_filter(width: int, height: int) -> str:
+    if width >= height:
+        return (
+            "[0:v]split=2[main][bg];" 
+            "[bg]scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,boxblur=50:5[bgb];" 
+            "[main]scale=1080:1920:force_original_aspect_ratio=decrease[fg];" 
+
+            "[bgb][fg]overlay=(W-w)/2:(H-h)/2," 
+            "format=yuv420p" 
+        )
+    return "scale=1080:1920,format=yuv420p"
+
+
+_analysis_pool = None
+_analysis_pool_lock = threading.Lock()
+
+
+def _get_analysis_pool():
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            _analysis_pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ANALYSIS_WORKERS", None) or max(os.cpu_count() or 1, 2),
+                thread_name_prefix="analysis",
+            )
+        return _analysis_pool
+
+
+def _timed(timings, phase, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        timings[phase] = round(time.perf_counter() - t0, 3)
+
+
+def _transcribe_in_worker(filepath):
+    close_old_connections()
+    try:
+        return get_transcript(filepath)
+    finally:
+        close_old_connections()
+
+
+def _scan_motion(filepath, **kwargs):
+    tracker = track("motion", 1.0)
+    with measure("motion"):
+        result = frame_diffs(filepath, on_progress=tracker.update if tracker else None, **kwargs)
+    if tracker is not None:
+        tracker.update(1.0)
+    return result
+
+
+def analyze_highlight(filepath: str, fps: int = 30, segments=None, stride: int = None, analysis_width: int = None,
+    duration: float = 30, count: int = 1):
+    if stride is None:
+        stride = getattr(settings, "MOTION_FRAME_STRIDE", 1)
+    if analysis_width is None:
+        analysis_width = getattr(settings, "MOTION_ANALYSIS_WIDTH", None)
+
+    timings = {}
+    t0 = time.perf_counter()
+    pool = _get_analysis_pool()
+    # transcription and the frame-diff scan are independent, so they run side by side
+    motion_future = submit(
+        pool, _timed, timings, "motion", _scan_motion, filepath, stride=stride, analysis_width=analysis_width, fps=fps
+    )
+    transcript = None
+    if segments is None:
+        transcript = submit(pool, _timed, timings, "transcribe", _transcribe_in_worker, filepath).result()
+        segments = transcript.segments
+    diffs, frame_index, fps = motion_future.result()
+
+    t1 = time.perf_counter()
+    windows = [{"start": 0, "score": 0.0}]
+    if len(diffs):
+        motion = motion_per_second(diffs, frame_index, fps)
+        window = max(int(round(duration)), 1)
+        scores = window_scores(
+            motion, speech_coverage(segments, len(motion)), window,
+            speech_weight=getattr(settings, "HIGHLIGHT_SPEECH_WEIGHT", 0.5),
+        )
+        picks = top_windows(scores, window, max(count, 1), getattr(settings, "HIGHLIGHT_MAX_OVERLAP", 0.0))
+        windows = [{"start": start, "score": round(score, 4)} for start, score in picks] or windows
+    timings["score"] = round(time.perf_counter() - t1, 3)
+    timings["total"] = round(time.perf_counter() - t0, 3)
+
+    return {
+        "start": windows[0]["start"],
+        "windows": windows,
+        "transcript": transcript,
+        "segments": segments,
+        "timings": timings,
     }
 
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(str(url), download=True)
-        file_path = ydl.prepare_filename(info)
-        return file_path, info.get("title", ""), info.get("id")
+def find_best_start(filepath: str, fps: int = 30, segments=None, stride: int = None, analysis_width: int = None,
+    duration: float = 30):
+    return analyze_highlight(filepath, fps=fps, segments=segments, stride=stride, analysis_width=analysis_width,
+        duration=duration)["start"]
 
-def trim_video(input_path: str, yt_id: str, db_id: int, duration: int = 30):
+
+def trim_video(input_path: str, yt_id: str, db_id: int, duration: int = 30, start_time: float = None):
+    """Cut the window out of the source without cropping, as the two-pass
+    pipeline did before ``render_short``; only the benchmarks still use it."""
     output_dir = _ensure_dir(os.path.join(settings.MEDIA_ROOT, 'shorts'))
     output_name = f"short_{yt_id}_{db_id}.mp4"
     output_path = os.path.join(output_dir, output_name)
 
-    best_start_time = find_best_start(input_path)
+    best_start_time = find_best_start(input_path, duration=duration) if start_time is None else start_time
+    profile = encoding_profile()
 
     cmd = [
         "ffmpeg",
@@ -94,18 +143,14 @@ def trim_video(input_path: str, yt_id: str, db_id: int, duration: int = 30):
         "-i", input_path,
         "-t", str(duration),
         "-vf", "scale=1280:-2",  
-        "-c:v", "libx264",
-        "-preset", "fast",
-        "-crf", "23",
+        *profile.video_args(),
         "-c:a", "aac",
         "-b:a", "128k",
         output_path
     ]
 
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
-        if os.path.exists(input_path):
-            os.remove(input_path)
+        run_ffmpeg(cmd, "trim", tracker=track("trim", duration))
     except subprocess.CalledProcessError as e:
         print("FFmpeg trimming error:\n", e.stderr.decode())
         raise e
@@ -124,37 +169,21 @@ def resizing_trimmed_video(input_path: str, yt_id: str, db_id: int):
     final_output_name = f"short_{yt_id}_{db_id}.mp4"
     final_output_path = os.path.join(output_dir, final_output_name)
 
-    cap = cv2.VideoCapture(full_input_path)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    cap.release()
-
-    if width >= height:
-        vf_filter = (
-            "[0:v]split=2[main][bg];" 
-            "[bg]scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,boxblur=50:5[bgb];" 
-            "[main]scale=1080:1920:force_original_aspect_ratio=decrease[fg];" 
-
-            "[bgb][fg]overlay=(W-w)/2:(H-h)/2," 
-            "format=yuv420p" 
-        )
-    else:
-        vf_filter = "scale=1080:1920,format=yuv420p"
+    info = probe_video(full_input_path)
+    vf_filter = reframe_filter(info["width"], info["height"])
 
     cmd = [
         "ffmpeg",
         "-y",
         "-i", full_input_path,
         "-vf", vf_filter,
-        "-c:v", "libx264",
-        "-preset", "medium",
-        "-crf", "23",
+        *encoding_profile().video_args(),
         "-c:a", "copy", 
         temp_output_path
     ]
 
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
+        run_ffmpeg(cmd, "resize", tracker=track("resize", info["duration"]))
 
         os.remove(full_input_path)
         os.rename(temp_output_path, final_output_path)
@@ -162,6 +191,42 @@ def resizing_trimmed_video(input_path: str, yt_id: str, db_id: int):
     except subprocess.CalledProcessError as e:
         print("FFmpeg resize error:\n", e.stderr.decode())
         raise e
+    finally:
+        if os.path.exists(temp_output_path):
+            os.remove(temp_output_path)
+
+    return os.path.join("shorts", final_output_name)
+
+
+def render_short(input_path: str, yt_id: str, db_id: int, start_time: float, duration: int = 30):
+    output_dir = _ensure_dir(os.path.join(settings.MEDIA_ROOT, 'shorts'))
+    temp_output_path = os.path.join(output_dir, f"resized_temp_{uuid.uuid4().hex[:8]}.mp4")
+    final_output_name = f"short_{yt_id}_{db_id}.mp4"
+    final_output_path = os.path.join(output_dir, final_output_name)
+
+    info = probe_video(input_path)
+    vf_filter = reframe_filter(info["width"], info["height"])
+    profile = encoding_profile()
+
+    try:
+        encode_video(
+            input_path, temp_output_path,
+            filter_args=["-vf", vf_filter],
+            video_args=profile.video_args(threads=False),
+            audio_args=["-c:a", "aac", "-b:a", "128k"],
+            start=start_time,
+            duration=duration,
+            graph=vf_filter,
+            stage="render",
+            threads=profile.threads,
+        )
+        os.replace(temp_output_path, final_output_path)
+    except subprocess.CalledProcessError as e:
+        print("FFmpeg render error:\n", e.stderr.decode())
+        raise e
+    finally:
+        if os.path.exists(temp_output_path):
+            os.remove(temp_output_path)
 
     return os.path.join("shorts", final_output_name)
 """
@@ -213,15 +278,12 @@ FILTERS = {
     'dreamy_bloom': "eq=brightness=0.08:contrast=0.9,unsharp=7:7:-1.5:7:7:-1.5,vignette=angle=1.2",
 }
 
-def apply_filter_to_video(input_relative_path: str, filter_name: str) -> str:
-    if filter_name not in FILTERS:
-        raise ValueError(f"Invalid filter: {filter_name}")
+def _filter_args(graph: str):
+    return ["-filter_complex", graph] if (';' in graph or ('[' in graph and ']' in graph)) else ["-vf", graph]
 
-    root = settings.MEDIA_ROOT
-    in_path = os.path.join(root, input_relative_path)
-    if not os.path.exists(in_path):
-        raise FileNotFoundError(f"Input file not found: {in_path}")
 
+def _filter_base(in_path: str):
+    root = settings.MEDIA_ROOT
     d = os.path.dirname(in_path)
     stem, ext = os.path.splitext(os.path.basename(in_path))
     base_stem = re.sub(r'_filter_.*$', '', stem)
@@ -233,51 +295,249 @@ def apply_filter_to_video(input_relative_path: str, filter_name: str) -> str:
     base_path = next((p for p in candidates if os.path.exists(p)), in_path if stem == base_stem else None)
     if not base_path:
         raise FileNotFoundError(f"Could not find base video for '{in_path}'")
+    return base_path, base_stem, ext
+
+
+def apply_filter_to_video(input_relative_path: str, filter_name: str) -> str:
+    if filter_name not in FILTERS:
+        raise ValueError(f"Invalid filter: {filter_name}")
+
+    root = settings.MEDIA_ROOT
+    in_path = os.path.join(root, input_relative_path)
+    if not os.path.exists(in_path):
+        raise FileNotFoundError(f"Input file not found: {in_path}")
 
+    base_path, base_stem, ext = _filter_base(in_path)
     out_dir = os.path.dirname(base_path)
     out_path = os.path.join(out_dir, f"{base_stem}_filter_{filter_name}{ext}")
-    if os.path.exists(out_path):  
+    if cache_hit("filter", out_path):
         return os.path.relpath(out_path, root).replace("\\", "/")
-    try:
-        for f in os.listdir(out_dir):
-            if f.startswith(base_stem + "_filter_"):
-                try: os.remove(os.path.join(out_dir, f))
-                except: pass
-    except FileNotFoundError:
-        os.makedirs(out_dir, exist_ok=True)
+    os.makedirs(out_dir, exist_ok=True)
 
     graph = FILTERS[filter_name]
-    flt_flag = ["-filter_complex", graph] if (';' in graph or ('[' in graph and ']' in graph)) else ["-vf", graph]
-
-    cmd = ["ffmpeg", "-y", "-i", base_path, *flt_flag, "-c:v", "libx264", "-preset", "fast", "-crf", "23", "-c:a", "copy", out_path]
+    temp_path = os.path.join(out_dir, f"filter_temp_{uuid.uuid4().hex[:8]}{ext}")
+    profile = encoding_profile()
 
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
+        encode_video(
+            base_path, temp_path,
+            filter_args=_filter_args(graph),
+            video_args=profile.video_args(threads=False),
+            audio_args=["-c:a", "copy"],
+            graph=graph,
+            stage="filter",
+            threads=profile.threads,
+        )
+        os.replace(temp_path, out_path)
     except subprocess.CalledProcessError as e:
         raise RuntimeError(f"FFmpeg failed for filter '{filter_name}': {e.stderr.decode(errors='ignore')}") from e
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    variants = [os.path.join(out_dir, f"{base_stem}_filter_{name}{ext}") for name in FILTERS]
+    evict_lru("filter", variants, getattr(settings, "FILTER_CACHE_MAX_BYTES", 512 * 1024 * 1024), keep={out_path})
 
     return os.path.relpath(out_path, root).replace("\\", "/")
 
 
+_GRAPH_LABEL = re.compile(r"\[([A-Za-z0-9_]+)\]")
 
-def generate_srt_subtitles(input_relative_path: str) -> str:
+
+def _branch_graph(graph: str, index: int) -> str:
+    # internal pad labels get a per-branch prefix so several filters can share one graph
+    body = _GRAPH_LABEL.sub(lambda m: f"[f{index}_{m.group(1)}]", graph.strip())
+    return f"[s{index}]{body}[o{index}]"
+
+
+def apply_filters_to_video(input_relative_path: str, filter_names, keep=()) -> dict:
+    """Render several filters from one decode of the base video: a ``split``
+    feeds every filter chain and each branch is encoded to its own output.
+
+    Returns the output path of every filter, the filters actually rendered
+    (the others were cached), the base duration and the batch's wall time.
+    ffmpeg finishes every output together, so there is no time per filter.
+    Cache eviction spares the outputs and the media names in ``keep``.
+    """
+    names = list(dict.fromkeys(filter_names))
+    invalid = [name for name in names if name not in FILTERS]
+    if invalid:
+        raise ValueError(f"Invalid filter: {', '.join(invalid)}")
+
+    root = settings.MEDIA_ROOT
+    in_path = os.path.join(root, input_relative_path)
+    if not os.path.exists(in_path):
+        raise FileNotFoundError(f"Input file not found: {in_path}")
+
+    base_path, base_stem, ext = _filter_base(in_path)
+    out_dir = os.path.dirname(base_path)
+    out_paths = {name: os.path.join(out_dir, f"{base_stem}_filter_{name}{ext}") for name in names}
+    pending = [name for name in names if not cache_hit("filter", out_paths[name])]
+    duration = probe_video(base_path)["duration"]
+    timings = {}
+
+    if pending:
+        temp_paths = {name: os.path.join(out_dir, f"filter_temp_{uuid.uuid4().hex[:8]}{ext}") for name in pending}
+        graph = f"[0:v]split={len(pending)}" + "".join(f"[s{i}]" for i in range(len(pending))) + ";" + \
+            ";".join(_branch_graph(FILTERS[name], i) for i, name in enumerate(pending))
+
+        # the outputs encode side by side and share the profile's threads
+        profile = encoding_profile()
+        threads = max(profile.threads // len(pending), 1)
+        cmd = ["ffmpeg", "-y", "-i", base_path, "-filter_complex", graph]
+        for i, name in enumerate(pending):
+            cmd += [
+                "-map", f"[o{i}]", "-map", "0:a?",
+                *profile.video_args(threads=False), "-threads", str(threads),
+                "-c:a", "copy",
+                temp_paths[name]
+            ]
+
+        started = time.time()
+        try:
+            run_ffmpeg(cmd, "filter_batch", tracker=track("filter", duration))
+            for name in pending:
+                os.replace(temp_paths[name], out_paths[name])
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"FFmpeg failed for filters {', '.join(pending)}: {e.stderr.decode(errors='ignore')}") from e
+        finally:
+            for path in temp_paths.values():
+                if os.path.exists(path):
+                    os.remove(path)
+        timings["batch.total"] = round(time.time() - started, 3)
+
+        variants = [os.path.join(out_dir, f"{base_stem}_filter_{name}{ext}") for name in FILTERS]
+        evict_lru("filter", variants, getattr(settings, "FILTER_CACHE_MAX_BYTES", 512 * 1024 * 1024),
+            keep={*out_paths.values(), *(os.path.join(root, name) for name in keep if name)})
+
+    return {
+        "files": {name: os.path.relpath(path, root).replace("\\", "/") for name, path in out_paths.items()},
+        "timings": timings,
+        "rendered": pending,
+        "duration": duration,
+    }
+
+
+def _preview_command(input_relative_path, graph, mode, start, cache_key):
+    """Where the preview goes and, unless it is cached, the temp path and
+    ffmpeg command that render it."""
+    root = settings.MEDIA_ROOT
+    in_path = os.path.join(root, input_relative_path)
+    if not os.path.exists(in_path):
+        raise FileNotFoundError(f"Input file not found: {in_path}")
+    if mode not in ("clip", "frames"):
+        raise ValueError(f"Invalid preview mode: {mode}")
+
+    width = getattr(settings, "PREVIEW_WIDTH", 360)
+    height = getattr(settings, "PREVIEW_HEIGHT", 640)
+    seconds = getattr(settings, "PREVIEW_SECONDS", 4)
+
+    out_dir = _ensure_dir(os.path.join(root, "previews"))
+    stem = os.path.splitext(os.path.basename(in_path))[0]
+    key = f"{input_relative_path}:{os.path.getmtime(in_path)}:{cache_key or graph}:{mode}:{start}:{width}x{height}:{seconds}"
+    ext = ".jpg" if mode == "frames" else ".mp4"
+    out_path = os.path.join(out_dir, f"{stem}_preview_{hashlib.sha1(key.encode()).hexdigest()[:12]}{ext}")
+    if cache_hit("preview", out_path):
+        return out_path, None, None
+
+    temp_path = os.path.join(out_dir, f"preview_temp_{uuid.uuid4().hex[:8]}{ext}")
+    if mode == "frames":
+        frames = getattr(settings, "PREVIEW_FRAMES", 4)
+        duration = probe_video(in_path)["duration"] or seconds
+        chain = f"fps={frames}/{duration},scale={width}:{height},{graph},tile={frames}x1"
+        cmd = ["ffmpeg", "-y", "-i", in_path, *_filter_args(chain), "-frames:v", "1", "-q:v", "4", temp_path]
+    else:
+        chain = f"scale={width}:{height},{graph}"
+        cmd = [
+            "ffmpeg", "-y",
+            "-ss", str(start),
+            "-i", in_path,
+            "-t", str(seconds),
+            *_filter_args(chain),
+            # previews are drafts: keep the fastest settings, only the thread
+            # count follows the load
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28",
+            "-threads", str(encoding_profile().threads),
+            "-c:a", "aac", "-b:a", "64k",
+            temp_path
+        ]
+    return out_path, temp_path, cmd
+
+
+def _preview_done(out_path, rendered):
+    root = settings.MEDIA_ROOT
+    if rendered:
+        out_dir = os.path.dirname(out_path)
+        previews = [os.path.join(out_dir, f) for f in os.listdir(out_dir) if "_preview_" in f]
+        evict_lru("preview", previews, getattr(settings, "PREVIEW_CACHE_MAX_BYTES", 256 * 1024 * 1024), keep={out_path})
+    return os.path.relpath(out_path, root).replace("\\", "/")
+
+
+async def render_preview_async(input_relative_path: str, graph: str, mode: str = "clip", start: float = 0,
+    cache_key: str = None) -> str:
+    """Render (or reuse) a short preview of ``graph`` applied to the video;
+    the file checks and probe go to the blocking pool and ffmpeg is awaited."""
+    out_path, temp_path, cmd = await run_blocking(_preview_command, input_relative_path, graph, mode, start, cache_key)
+    if cmd is None:
+        return _preview_done(out_path, rendered=False)
+
+    try:
+        await run_ffmpeg_async(cmd, "preview")
+        os.replace(temp_path, out_path)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg preview failed: {e.stderr.decode(errors='ignore')}") from e
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return await run_blocking(_preview_done, out_path, rendered=True)
+
+
+async def preview_filter_async(input_relative_path: str, filter_name: str, mode: str = "clip", start: float = 0) -> str:
+    if filter_name not in FILTERS:
+        raise ValueError(f"Invalid filter: {filter_name}")
+
+    root = settings.MEDIA_ROOT
+    base_path, _, _ = _filter_base(os.path.join(root, input_relative_path))
+    return await render_preview_async(os.path.relpath(base_path, root), FILTERS[filter_name], mode=mode, start=start)
+
+
+async def preview_subtitles_async(input_relative_path: str, segments, mode: str = "clip", start: float = None,
+    font: str = "Impact", fontsize: int = 80, bold: int = 1, color: str = "&H00FF0000") -> str:
+    if start is None:
+        start = segments[0]["start"] if segments and mode == "clip" else 0
+    if mode == "clip":
+        segments = clip_segments(segments, start, getattr(settings, "PREVIEW_SECONDS", 4))
+
+    out_dir = _ensure_dir(os.path.join(settings.MEDIA_ROOT, "previews"))
+    key = json.dumps([segments, font, fontsize, bold, color], sort_keys=True)
+    ass_path = os.path.join(out_dir, f"subs_{uuid.uuid4().hex[:8]}.ass")
+    style_subtitles_to_ass_file(subtitles=segments,
+        output_path=ass_path,
+        font=font,
+        fontsize=fontsize,
+        bold=bold,
+        color=color)
+    try:
+        return await render_preview_async(input_relative_path, f"ass='{ass_path}'", mode=mode, start=start, cache_key=key)
+    finally:
+        os.remove(ass_path)
+
+
+def generate_srt_subtitles(input_relative_path: str, segments=None) -> str:
     root = settings.MEDIA_ROOT
     input_path = os.path.join(root, input_relative_path)
     
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"Video not found: {input_path}")
 
-    model = whisper.load_model("base")
-    
-    result = model.transcribe(input_path)
-    
-    
+    if segments is None:
+        segments = get_transcript(input_path).segments
 
     base, ext = os.path.splitext(input_path)
     srt_path = base + ".srt"
 
     with open(srt_path, "w", encoding="utf-8") as f:
-        for i, segment in enumerate(result["segments"]):
+        for i, segment in enumerate(segments):
             start = segment["start"]
             end = segment["end"]
             text = segment["text"].strip()
@@ -354,19 +614,71 @@ def burn_subtitles_to_video(input_relative_path:str,srt_relative_path:str,ass_fi
     output_filename = f"{base_name}_subtitled{ext}"
     output_path = os.path.join(os.path.dirname(input_path), output_filename)
 
+    graph = f"ass='{ass_file}'"
+    # restyles overwrite the previous burn, so it is only replaced once complete
+    temp_path = os.path.join(os.path.dirname(input_path), f"subtitled_temp_{uuid.uuid4().hex[:8]}{ext}")
+    profile = encoding_profile()
+    try:
+        encode_video(
+            input_path, temp_path,
+            filter_args=["-vf", graph],
+            video_args=profile.video_args(threads=False),
+            audio_args=["-c:a", "copy"],
+            graph=graph,
+            stage="subtitles",
+            threads=profile.threads,
+        )
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return os.path.relpath(output_path, root).replace("\\", "/")
+
+
+# Whisper reports ISO 639-1 codes; mp4 tracks are tagged with ISO 639-2/T
+ISO_639_2 = {
+    "ar": "ara", "de": "deu", "en": "eng", "es": "spa", "fr": "fra", "hi": "hin", "id": "ind",
+    "it": "ita", "ja": "jpn", "ko": "kor", "nl": "nld", "pl": "pol", "pt": "por", "ru": "rus",
+    "sv": "swe", "tr": "tur", "uk": "ukr", "vi": "vie", "zh": "zho",
+}
+
+
+def mux_soft_subtitles(input_relative_path: str, segments, language: str = None) -> str:
+    """Add the segments as a selectable mov_text track; audio and video are stream copied."""
+    root = settings.MEDIA_ROOT
+    input_path = os.path.join(root, input_relative_path)
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input video not found: {input_path}")
+
+    srt_path = os.path.join(root, generate_srt_subtitles(input_relative_path, segments))
+    base_name, ext = os.path.splitext(os.path.basename(input_path))
+    output_path = os.path.join(os.path.dirname(input_path), f"{base_name}_softsub{ext}")
+    temp_path = os.path.join(os.path.dirname(input_path), f"softsub_temp_{uuid.uuid4().hex[:8]}{ext}")
+
     cmd = [
-        "ffmpeg",
-        "-y",
+        "ffmpeg", "-y",
         "-i", input_path,
-        "-vf", f"ass='{ass_file}'",
-        "-c:v", "libx264",
-        "-preset", "fast",
-        "-crf", "23",
-        "-c:a", "copy",
-        output_path
+        "-i", srt_path,
+        "-map", "0:v", "-map", "0:a?", "-map", "1:0",
+        "-c", "copy",
+        "-c:s", "mov_text",
     ]
-    subprocess.run(cmd, check=True, capture_output=True)
-    
+    if language:
+        cmd += ["-metadata:s:s:0", f"language={ISO_639_2.get(language, language)}"]
+    cmd.append(temp_path)
+
+    try:
+        run_ffmpeg(cmd, "soft_subtitles")
+        os.replace(temp_path, output_path)
+    except subprocess.CalledProcessError as e:
+        print("FFmpeg subtitle mux error:\n", e.stderr.decode())
+        raise e
+    finally:
+        os.remove(srt_path)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
     return os.path.relpath(output_path, root).replace("\\", "/")
 
 
@@ -374,13 +686,16 @@ def burn_subtitles_to_video(input_relative_path:str,srt_relative_path:str,ass_fi
 def add_subtitles_to_video(input_relative_path: str ,font: str = "Impact",
     fontsize: int = 80,
     bold: int = 1,
-    color: str = "&H00FF0000") -> str:
+    color: str = "&H00FF0000",
+    segments=None,
+    soft: bool = False,
+    language: str = None) -> str:
     root = settings.MEDIA_ROOT
     input_path = os.path.join(root, input_relative_path)
 
-    model = whisper.load_model("base")
-    result = model.transcribe(input_path)
-    subtitles = result["segments"]
+    subtitles = segments if segments is not None else get_transcript(input_path).segments
+    if soft:
+        return mux_soft_subtitles(input_relative_path, subtitles, language=language)
 
     ass_path = os.path.splitext(input_path)[0] + ".ass"
     style_subtitles_to_ass_file(subtitles=subtitles,
@@ -390,7 +705,9 @@ def add_subtitles_to_video(input_relative_path: str ,font: str = "Impact",
         bold=bold,
         color=color)
 
-    subtitled_video_path = burn_subtitles_to_video(input_relative_path, "", ass_file=ass_path)
-    os.remove(ass_path)
+    try:
+        subtitled_video_path = burn_subtitles_to_video(input_relative_path, "", ass_file=ass_path)
+    finally:
+        os.remove(ass_path)
 
     return subtitled_video_path
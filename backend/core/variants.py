@@ -0,0 +1,41 @@
+import os
+import re
+
+from django.conf import settings
+
+from .utils import apply_filter_to_video
+
+DERIVED_SUFFIX = re.compile(r"(?:_filter_.*|_subtitled|_softsub)+$")
+
+
+def master_name(video) -> str:
+    """The clean render every look of ``video`` is made from."""
+    if video.original_short_video_file:
+        return video.original_short_video_file.name
+
+    # shorts rendered before masters were kept: recover the unfiltered,
+    # unsubtitled render from the derived file name when it still exists
+    name = video.short_video_file.name
+    stem, ext = os.path.splitext(name)
+    base = DERIVED_SUFFIX.sub("", stem) + ext
+    if base != name and os.path.exists(os.path.join(settings.MEDIA_ROOT, base)):
+        name = base
+    video.original_short_video_file.name = name
+    video.save(update_fields=['original_short_video_file', 'updated_at'])
+    return name
+
+
+def look_name(video, render: bool = True) -> str:
+    """The master with the video's current filter applied, without subtitles.
+
+    With ``render=False`` a filtered variant that is not cached falls back to
+    the master instead of being rendered.
+    """
+    master = master_name(video)
+    if not video.filter_name:
+        return master
+    if not render:
+        stem, ext = os.path.splitext(master)
+        variant = f"{stem}_filter_{video.filter_name}{ext}"
+        return variant if os.path.exists(os.path.join(settings.MEDIA_ROOT, variant)) else master
+    return apply_filter_to_video(master, video.filter_name)
@@ -0,0 +1,169 @@
+import gc
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import tqdm
+import whisper
+from django.conf import settings
+
+from .progress import track
+
+
+class _ProgressTqdm(tqdm.tqdm):
+    """Whisper's progress bar, also reported as the current job's transcribe progress."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tracker = track("transcribe", self.total)
+
+    def update(self, n=1):
+        displayed = super().update(n)
+        if self._tracker is not None:
+            self._tracker.update(self.n)
+        return displayed
+
+
+# whisper.transcribe() counts decoded mel frames with tqdm.tqdm
+importlib.import_module("whisper.transcribe").tqdm = SimpleNamespace(tqdm=_ProgressTqdm)
+
+
+def _model_nbytes(model):
+    return sum(p.numel() * p.element_size() for p in model.parameters()) + \
+        sum(b.numel() * b.element_size() for b in model.buffers())
+
+
+class _LoadedModel:
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.nbytes = _model_nbytes(model)
+        # whisper installs kv-cache hooks on the model for every decode, so two
+        # transcriptions must never run on the same instance at the same time
+        self.lock = threading.Lock()
+        self.users = 0
+        self.last_used = time.monotonic()
+
+
+class WhisperModelRegistry:
+    """Keeps Whisper models warm for the lifetime of the worker process.
+
+    Each model is loaded at most once, transcriptions on one model are
+    serialized, and models that sit idle are dropped again once
+    ``WHISPER_IDLE_SECONDS`` passes or the ``WHISPER_MEMORY_BUDGET_MB``
+    budget is exceeded.
+    """
+
+    def __init__(self, memory_budget_mb=None, idle_seconds=None, device=None):
+        self._memory_budget_mb = memory_budget_mb
+        self._idle_seconds = idle_seconds
+        self._device = device
+        self._models = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    @property
+    def memory_budget(self):
+        mb = self._memory_budget_mb
+        if mb is None:
+            mb = getattr(settings, "WHISPER_MEMORY_BUDGET_MB", 2048)
+        return int(mb * 1024 * 1024)
+
+    @property
+    def idle_seconds(self):
+        if self._idle_seconds is not None:
+            return self._idle_seconds
+        return getattr(settings, "WHISPER_IDLE_SECONDS", 15 * 60)
+
+    @property
+    def device(self):
+        return self._device or getattr(settings, "WHISPER_DEVICE", None)
+
+    def loaded(self):
+        with self._lock:
+            return {name: entry.nbytes for name, entry in self._models.items()}
+
+    def _get_or_load(self, name):
+        with self._lock:
+            entry = self._models.get(name)
+            if entry:
+                entry.users += 1
+                return entry
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry:
+                    entry.users += 1
+                    return entry
+
+            model = whisper.load_model(name, device=self.device)
+            entry = _LoadedModel(name, model)
+            with self._lock:
+                self._models[name] = entry
+                entry.users += 1
+                self._evict_locked(keep=name)
+            return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+            self._evict_locked()
+
+    def _evict_locked(self, keep=None):
+        now = time.monotonic()
+        idle = [
+            e for e in self._models.values()
+            if e.users == 0 and e.name != keep and now - e.last_used > self.idle_seconds
+        ]
+        for entry in idle:
+            del self._models[entry.name]
+
+        total = sum(e.nbytes for e in self._models.values())
+        for entry in sorted(self._models.values(), key=lambda e: e.last_used):
+            if total <= self.memory_budget:
+                break
+            if entry.users or entry.name == keep:
+                continue
+            del self._models[entry.name]
+            total -= entry.nbytes
+            idle.append(entry)
+
+        if idle:
+            gc.collect()
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict_locked()
+
+    def preload(self, names):
+        for name in names:
+            self._release(self._get_or_load(name))
+
+    @contextmanager
+    def use(self, name=None):
+        entry = self._get_or_load(name or getattr(settings, "WHISPER_MODEL", "base"))
+        try:
+            with entry.lock:
+                yield entry.model
+        finally:
+            self._release(entry)
+
+    def transcribe(self, audio, model_name=None, **kwargs):
+        with self.use(model_name) as model:
+            return model.transcribe(audio, **kwargs)
+
+
+whisper_models = WhisperModelRegistry()
+
+
+def preload_whisper_models():
+    names = getattr(settings, "WHISPER_PRELOAD_MODELS", [])
+    if names:
+        threading.Thread(
+            target=whisper_models.preload, args=(names,), name="whisper-preload", daemon=True
+        ).start()
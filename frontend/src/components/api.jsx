@@ -32,25 +32,123 @@ export const logoutUser = () => {
 };
 
 
-export const convertYouTubeToShort = async (youtube_url) => {
-  const res = await axiosInstance.post("core/convert-video", { youtube_url });
+const JOB_POLL_INTERVAL_MS = 2000;
+// longest a job is waited for, so one lost to a server restart doesn't spin forever
+const JOB_TIMEOUT_MS = 30 * 60 * 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export const fetchJob = async (jobId) => {
+  const res = await axiosInstance.get(`core/jobs/${jobId}`);
   return res.data;
 };
 
-export const fetchMyVideos = async () => {
-  const res = await axiosInstance.get("core/my-videos");
+// Reads the job's server-sent events; fetch is used instead of EventSource
+// because the stream needs the Authorization header.
+export const streamJob = async (job, onUpdate, signal) => {
+  const res = await fetch(`${BASE_URL}core/jobs/${job.id}/events`, {
+    headers: { Authorization: `Bearer ${localStorage.getItem("access")}` },
+    signal,
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`Progress stream unavailable (${res.status})`);
+  }
+
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+
+    let end;
+    while ((end = buffer.indexOf("\n\n")) >= 0) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (event === "done") return JSON.parse(data);
+      if (event === "progress" && onUpdate) {
+        const progress = JSON.parse(data);
+        onUpdate({ ...job, status: "running", stage: progress.stage, progress: progress.stages });
+      }
+    }
+  }
+  return fetchJob(job.id);
+};
+
+export const waitForJob = async (job, onUpdate) => {
+  const deadline = Date.now() + JOB_TIMEOUT_MS;
+  const stream = new AbortController();
+  const timer = setTimeout(() => stream.abort(), JOB_TIMEOUT_MS);
+  try {
+    job = await streamJob(job, onUpdate, stream.signal);
+  } catch {
+    // fall back to polling
+  } finally {
+    clearTimeout(timer);
+  }
+  while (job.status === "queued" || job.status === "running") {
+    if (Date.now() >= deadline) {
+      throw new Error(`Job ${job.id} did not finish in time`);
+    }
+    await sleep(JOB_POLL_INTERVAL_MS);
+    job = await fetchJob(job.id);
+    if (onUpdate) onUpdate(job);
+  }
+  if (job.status === "failed") {
+    throw new Error(job.error || `Job failed during ${job.stage}`);
+  }
+  return job.video;
+};
+
+export const convertYouTubeToShort = async (youtube_url, onUpdate, { count = 1, duration = 30 } = {}) => {
+  const res = await axiosInstance.post("core/convert-video", { youtube_url, count, duration });
+  return waitForJob(res.data, onUpdate);
+};
+
+export const fetchMyVideos = async (cursor = null) => {
+  const res = await axiosInstance.get("core/my-videos", { params: cursor ? { cursor } : {} });
   return res.data;
 };
 
-export const applyFilter = async (videoId, filterName) => {
+export const applyFilter = async (videoId, filterName, onUpdate) => {
   const res = await axiosInstance.post(`core/videos/${videoId}/apply-filter`, {
     filter_name: filterName,
   });
-  return res.data;
+  return waitForJob(res.data, onUpdate);
 }
 
-export const applySubtitles = async (videoId, style = {}) =>{
+// Renders several filters in one pass; resolves with the finished job, whose
+// result.files maps each filter name to its video URL.
+export const applyFilters = async (videoId, filterNames, onUpdate) => {
+  const res = await axiosInstance.post(`core/videos/${videoId}/apply-filters`, {
+    filter_names: filterNames,
+  });
+  await waitForJob(res.data, onUpdate);
+  return fetchJob(res.data.id);
+};
+
+export const applySubtitles = async (videoId, style = {}, onUpdate) =>{
   const res = await axiosInstance.post(`core/videos/${videoId}/apply-subtitles`, style);
+  return waitForJob(res.data, onUpdate);
+}
+
+export const previewFilter = async (videoId, filterName, mode = "clip") => {
+  const res = await axiosInstance.post(`core/videos/${videoId}/apply-filter/preview`, {
+    filter_name: filterName,
+    mode,
+  });
+  return res.data;
+}
+
+export const previewSubtitles = async (videoId, style = {}, mode = "clip") => {
+  const res = await axiosInstance.post(`core/videos/${videoId}/apply-subtitles/preview`, { ...style, mode });
   return res.data;
 }
 
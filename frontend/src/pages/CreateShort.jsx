@@ -8,6 +8,7 @@ export default function CreateShort() {
   const [shortData, setShortData] = useState(null);
   const [error, setError] = useState(null);
   const [successMessage, setSuccessMessage] = useState(null);
+  const [progressLabel, setProgressLabel] = useState("");
   const [filterLoading, setFilterLoading] = useState(false);
   const [subtitlesLoading, setSubtitlesLoading] = useState(false);
   const [subtitleStyle, setSubtitleStyle] = useState({
@@ -32,7 +33,10 @@ export default function CreateShort() {
     setSuccessMessage(null);
 
     try {
-      const data = await convertYouTubeToShort(videoURL);
+      const data = await convertYouTubeToShort(videoURL, (job) => {
+        const stage = job.progress?.[job.stage];
+        setProgressLabel(stage ? `${job.stage} ${Math.round(stage.percent)}%` : job.stage || "");
+      });
       setShortData(data);
       setSuccessMessage("Short video created successfully!");
       setVideoURL("");
@@ -41,6 +45,7 @@ export default function CreateShort() {
       setError(err.message || "Failed to create short. Please try again.");
     } finally {
       setLoading(false);
+      setProgressLabel("");
     }
   };
 
@@ -102,7 +107,7 @@ export default function CreateShort() {
                     <circle className="opacity-25" cx="12" cy="12" r="10" stroke="white" strokeWidth="4" />
                     <path className="opacity-75" fill="white" d="M4 12a8 8 0 018-8V0C5 0 0 5 0 12h4z" />
                   </svg>
-                  Generating...
+                  Generating...{progressLabel && ` ${progressLabel}`}
                 </>
               ) : (
                 "Create Short"
@@ -5,14 +5,30 @@ import { fetchMyVideos } from "../components/api" // Your API function
 
 export default function ListMyVideos() {
   const [videos, setVideos] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [error, setError] = useState(null) // For simple error display
 
+  const loadMore = async () => {
+    setLoadingMore(true)
+    try {
+      const page = await fetchMyVideos(nextCursor)
+      setVideos((current) => [...current, ...page.items])
+      setNextCursor(page.next_cursor)
+    } catch (err) {
+      console.error("Failed to fetch more videos:", err)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   useEffect(() => {
     const loadVideos = async () => {
       try {
-        const data = await fetchMyVideos()
-        setVideos(data)
+        const page = await fetchMyVideos()
+        setVideos(page.items)
+        setNextCursor(page.next_cursor)
       } catch (err) {
         console.error("Failed to fetch videos:", err)
         setError("Unable to load your videos. Please try again later.")
@@ -91,6 +107,18 @@ export default function ListMyVideos() {
             </div>
           ))}
         </div>
+
+        {nextCursor && (
+          <div className="mt-8 text-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-6 py-2 bg-blue-600 text-white rounded-lg shadow hover:bg-blue-700 disabled:opacity-50"
+            >
+              {loadingMore ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   )